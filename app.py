@@ -9,16 +9,18 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import uuid
 import ast
-import duckdb
 from code_editor import code_editor
 from streamlit_quill import st_quill
 from streamlit_float import *
-from services.generator import project_generator
+from services.generator import project_generator, DEFAULT_ROWS
 from services.llm import LLMService
 from services.security import SafeExecutor, SecurityError
 from services.report_generator import generate_html_report
 from services.verifier import VerifierService
 from services.session_manager import serialize_session, deserialize_session
+from services.compact import memory_report
+from services.project_pool import project_pool
+from services.sql_engine import SQLSession, SQLResult
 
 # --- Page Config ---
 st.set_page_config(
@@ -55,6 +57,23 @@ if 'verification_result' not in st.session_state:
     st.session_state.verification_result = None
 if 'generation_phase' not in st.session_state:
     st.session_state.generation_phase = 'idle' # idle, generating, complete
+if 'dataset_rows' not in st.session_state:
+    st.session_state.dataset_rows = DEFAULT_ROWS
+# Dataset sizes offered in the settings; the notebook holds the whole dataset in memory
+DATASET_ROW_OPTIONS = [DEFAULT_ROWS, 50000, 100000, 250000, 500000, 1000000]
+# Generate several recipe candidates in parallel instead of refining one sequentially
+if 'speculative_generation' not in st.session_state:
+    st.session_state.speculative_generation = False
+SPECULATIVE_CANDIDATES = 3
+
+# Quick-start sectors: (button label, sector). Ready projects for these are kept in a background pool.
+QUICK_STARTS = [
+    ("🛍️ Retail", "Retail"),
+    ("🏥 Healthcare", "Healthcare"),
+    ("💰 Finance", "Finance"),
+    ("💻 Tech", "Technology")
+]
+project_pool.start([sector for _, sector in QUICK_STARTS])
 
 # Initialize LLM Service (stateless)
 llm_service = LLMService()
@@ -518,6 +537,54 @@ def load_session_callback():
         except Exception as e:
             st.error(f"Error loading session: {e}")
 
+def get_sql_session():
+    """The session's DuckDB connection, created on first use."""
+    if st.session_state.get('sql_session') is None:
+        st.session_state.sql_session = SQLSession()
+    return st.session_state.sql_session
+
+def set_sql_page(page_key, page):
+    st.session_state[page_key] = max(0, page)
+
+def render_sql_result(cell_id, result):
+    """Shows one page of a SQL result; further pages and the row count are only fetched on request."""
+    if not isinstance(result, SQLResult):
+        st.dataframe(result)
+        return
+
+    page_key = f"sql_page_{cell_id}"
+    page = st.session_state.get(page_key, 0)
+    try:
+        table = result.page(page)
+        total = result.known_rows
+    except RuntimeError as e:
+        st.caption(str(e))
+        page, table, total = 0, result.page(0), result.known_rows
+    st.dataframe(table)
+
+    first = page * result.page_rows
+    last = first + table.num_rows
+    has_next = last < total if total is not None else table.num_rows == result.page_rows
+
+    col_info, col_count, col_prev, col_next = st.columns([4, 1, 1, 1])
+    with col_info:
+        st.caption(f"Rows {first + 1 if table.num_rows else 0}–{last} of {total if total is not None else 'many'}")
+    with col_count:
+        if total is None:
+            if st.button("Count rows", key=f"sql_count_{cell_id}", use_container_width=True):
+                try:
+                    result.num_rows()
+                except RuntimeError as e:
+                    st.caption(str(e))
+                else:
+                    st.rerun()
+    with col_prev:
+        st.button("Prev", key=f"sql_prev_{cell_id}", disabled=page == 0, use_container_width=True,
+                  on_click=set_sql_page, args=(page_key, page - 1))
+    with col_next:
+        st.button("Next", key=f"sql_next_{cell_id}", disabled=not has_next, use_container_width=True,
+                  on_click=set_sql_page, args=(page_key, page + 1))
+
 def init_notebook_state():
     # Initialize scope with user data only (modules are injected at execution time)
     # We only store variables that need persistence (like df, user vars)
@@ -525,6 +592,11 @@ def init_notebook_state():
         'df': st.session_state.get('project_data')
     }
 
+    # A new scope starts with a fresh SQL connection (no tables from the previous project)
+    sql_session = st.session_state.pop('sql_session', None)
+    if sql_session is not None:
+        sql_session.close()
+
     # Initial Cells
     if not st.session_state.notebook_cells:
         st.session_state.notebook_cells = [
@@ -552,15 +624,26 @@ def init_notebook_state():
             if cell['type'] == 'markdown':
                 st.session_state.cell_edit_state[cell['id']] = True
 
-def get_execution_scope():
+def get_execution_scope(code=None):
     """
     Constructs the execution scope by merging the persistent user scope
     with standard library modules. This prevents modules from being stored
     in session state (which causes pickling errors).
+    For Python `code`, SQL results (kept as Arrow) that the code refers to are
+    converted to pandas DataFrames; SQL cells get them as they are.
     """
     # Base scope from user session
     scope = st.session_state.notebook_scope.copy()
 
+    if code is not None:
+        try:
+            names = {node.id for node in ast.walk(ast.parse(code)) if isinstance(node, ast.Name)}
+        except SyntaxError:
+            names = None
+        for key, val in scope.items():
+            if isinstance(val, SQLResult) and (names is None or key in names):
+                scope[key] = val.to_pandas()
+
     # Inject modules
     scope.update({
         'pd': pd,
@@ -614,7 +697,7 @@ def execute_cell(cell_idx):
         result_obj = None
 
         # Get fresh scope
-        exec_scope = get_execution_scope()
+        exec_scope = get_execution_scope(code)
 
         try:
             with contextlib.redirect_stdout(output_buffer):
@@ -659,37 +742,21 @@ def execute_cell(cell_idx):
 
     elif cell_type == 'sql':
         try:
-            # Connect to DuckDB
-            con = duckdb.connect()
+            # Long-lived connection: only new or changed frames are registered, temp tables persist
+            sql_session = get_sql_session()
 
             # Get Python Scope
             exec_scope = get_execution_scope()
 
-            # Register all DataFrames and Series found in the scope
-            for var_name, var_val in exec_scope.items():
-                if isinstance(var_val, pd.DataFrame):
-                    try:
-                        con.register(var_name, var_val)
-                        # Also register 'data' if it's the main df
-                        if var_name == 'df':
-                            con.register('data', var_val)
-                    except Exception:
-                        pass # Ignore registration errors
-                elif isinstance(var_val, pd.Series):
-                    try:
-                        # DuckDB requires DataFrame for registration
-                        con.register(var_name, var_val.to_frame())
-                    except Exception:
-                        pass # Ignore registration errors
-
             try:
-                # Execute Query and return as DataFrame
-                result_df = con.execute(code).df()
+                # Execute Query; the result stays Arrow until Python code uses it
+                result = sql_session.execute(code, exec_scope)
+                st.session_state.pop(f"sql_page_{st.session_state.notebook_cells[cell_idx]['id']}", None)
 
                 # Save result to Python scope
-                st.session_state.notebook_scope['last_sql_result'] = result_df
+                st.session_state.notebook_scope['last_sql_result'] = result
 
-                st.session_state.notebook_cells[cell_idx]['result'] = result_df
+                st.session_state.notebook_cells[cell_idx]['result'] = result
                 st.session_state.notebook_cells[cell_idx]['output'] = ""
             except Exception as e:
                 st.session_state.notebook_cells[cell_idx]['output'] = f"SQL Error: {e}"
@@ -725,186 +792,60 @@ def delete_cell(index):
             del st.session_state.cell_edit_state[cell_id]
         st.rerun()
 
-def render_loading_screen(placeholder):
-    try:
-        # Pass history to prevent repetition
-        history_context = st.session_state.generated_history[-5:] # Keep last 5 context items
-
-        # Step 1: Generate Narrative (Fixed)
-        placeholder.markdown('''
-            <div class="loading-container">
-                <div class="loader">
-                    <div class="spinner">
-                        <div class="ring glow"></div>
-                        <div class="ring main"></div>
-                    </div>
-                    <div class="cap-container glow">
-                        <div class="cap"><div class="cap-inner"></div></div>
-                    </div>
-                    <div class="cap-container main">
-                        <div class="cap"><div class="cap-inner"></div></div>
-                    </div>
+def render_loading_step(placeholder, label):
+    placeholder.markdown(f'''
+        <div class="loading-container">
+            <div class="loader">
+                <div class="spinner">
+                    <div class="ring glow"></div>
+                    <div class="ring main"></div>
+                </div>
+                <div class="cap-container glow">
+                    <div class="cap"><div class="cap-inner"></div></div>
+                </div>
+                <div class="cap-container main">
+                    <div class="cap"><div class="cap-inner"></div></div>
                 </div>
-                <div class="loading-text">Drafting Scenario Narrative...</div>
             </div>
-        ''', unsafe_allow_html=True)
+            <div class="loading-text">{label}</div>
+        </div>
+    ''', unsafe_allow_html=True)
 
-        narrative = project_generator._generate_scenario_narrative(
-            st.session_state.sector_input,
-            st.session_state.api_key,
-            previous_context=history_context
-        )
+def render_loading_screen(placeholder):
+    try:
+        # A ready project from the quick-start pool skips the whole pipeline
+        result = st.session_state.pop('pooled_project', None)
+
+        if result is None:
+            # Pass history to prevent repetition
+            history_context = st.session_state.generated_history[-5:] # Keep last 5 context items
+
+            # Narrative -> Recipe -> Data -> Verify (-> Refine), with the loader showing each step
+            result = project_generator.build_verified_project(
+                st.session_state.sector_input,
+                st.session_state.api_key,
+                verifier_service,
+                previous_context=history_context,
+                rows=st.session_state.dataset_rows,
+                speculative_candidates=SPECULATIVE_CANDIDATES if st.session_state.speculative_generation else 0,
+                on_stage=lambda label: render_loading_step(placeholder, label)
+            )
 
-        if "error" in narrative:
+        if "error" in result:
             placeholder.empty()
-            st.session_state['generation_error'] = narrative["error"]
+            st.session_state['generation_error'] = result["error"]
             st.session_state.generation_phase = 'idle'
             st.rerun()
             return
 
-        # Step 2: Generate Recipe & Data (Loop for correction)
-        max_retries = 3
-        current_try = 0
-        definition = None
-        df = None
-        verification = None
-
-        while current_try < max_retries:
-            if current_try == 0:
-                # Initial Recipe Generation
-                placeholder.markdown('''
-                    <div class="loading-container">
-                        <div class="loader">
-                            <div class="spinner">
-                                <div class="ring glow"></div>
-                                <div class="ring main"></div>
-                            </div>
-                            <div class="cap-container glow">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                            <div class="cap-container main">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                        </div>
-                        <div class="loading-text">Designing Data Recipe...</div>
-                    </div>
-                ''', unsafe_allow_html=True)
-                definition = project_generator._generate_data_recipe(narrative, st.session_state.api_key)
-            else:
-                # Refinement based on feedback
-                placeholder.markdown(f'''
-                    <div class="loading-container">
-                        <div class="loader">
-                            <div class="spinner">
-                                <div class="ring glow"></div>
-                                <div class="ring main"></div>
-                            </div>
-                            <div class="cap-container glow">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                            <div class="cap-container main">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                        </div>
-                        <div class="loading-text">Refining data (Attempt {current_try+1})...</div>
-                    </div>
-                ''', unsafe_allow_html=True)
-                definition = project_generator.refine_data_recipe(
-                    narrative,
-                    verification['issues'],
-                    st.session_state.api_key
-                )
-
-            if "error" in definition:
-                placeholder.empty()
-                st.session_state['generation_error'] = definition["error"]
-                st.session_state.generation_phase = 'idle'
-                st.rerun()
-                return
-
-            # Handle new "Schema-First" format (schema_list at root) vs Legacy (recipe key)
-            if 'schema_list' in definition:
-                # Inject granularity manually if missing from LLM output but present in narrative
-                if 'dataset_granularity' not in definition and 'dataset_granularity' in narrative:
-                    definition['dataset_granularity'] = narrative['dataset_granularity']
-                placeholder.markdown('''
-                    <div class="loading-container">
-                        <div class="loader">
-                            <div class="spinner">
-                                <div class="ring glow"></div>
-                                <div class="ring main"></div>
-                            </div>
-                            <div class="cap-container glow">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                            <div class="cap-container main">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                        </div>
-                        <div class="loading-text">Generating Synthetic Data...</div>
-                    </div>
-                ''', unsafe_allow_html=True)
-                df = project_generator.generate_dataset(definition, rows=10000, apply_simulation_chaos=False)
-            elif 'recipe' in definition:
-                # Legacy fallback
-                placeholder.markdown('''
-                    <div class="loading-container">
-                        <div class="loader">
-                            <div class="spinner">
-                                <div class="ring glow"></div>
-                                <div class="ring main"></div>
-                            </div>
-                            <div class="cap-container glow">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                            <div class="cap-container main">
-                                <div class="cap"><div class="cap-inner"></div></div>
-                            </div>
-                        </div>
-                        <div class="loading-text">Generating Synthetic Data...</div>
-                    </div>
-                ''', unsafe_allow_html=True)
-                df = project_generator.generate_dataset(definition['recipe'], rows=10000, apply_simulation_chaos=False)
-            else:
-                placeholder.empty()
-                st.session_state['generation_error'] = "Invalid recipe format received from AI."
-                st.session_state.generation_phase = 'idle'
-                st.rerun()
-                return
-
-            # Verify
-            placeholder.markdown('''
-                <div class="loading-container">
-                    <div class="loader">
-                        <div class="spinner">
-                            <div class="ring glow"></div>
-                            <div class="ring main"></div>
-                        </div>
-                        <div class="cap-container glow">
-                            <div class="cap"><div class="cap-inner"></div></div>
-                        </div>
-                        <div class="cap-container main">
-                            <div class="cap"><div class="cap-inner"></div></div>
-                        </div>
-                    </div>
-                    <div class="loading-text">Verifying Data Quality...</div>
-                </div>
-            ''', unsafe_allow_html=True)
-            verification = verifier_service.verify_dataset_schema(
-                definition,
-                df,
-                st.session_state.api_key
-            )
-
-            # Check Validity
-            if verification.get('valid', True):
-                break # Success!
-
-            current_try += 1
+        definition, df, verification = result["definition"], result["data"], result["verification"]
 
         # Apply Chaos Simulation (Post-Verification)
         # We ensure the dataset is messy for the user to clean, but only AFTER schema validation passed.
-        df = project_generator.apply_chaos_to_data(df, definition)
+        # The clean frame is kept alongside the overlay; the dirty view shares its untouched columns.
+        overlay = project_generator.plan_chaos(df, definition)
+        clean_df = df
+        df = overlay.materialize(clean_df)
 
         # Clear Pulse
         placeholder.empty()
@@ -913,15 +854,17 @@ def render_loading_screen(placeholder):
         st.session_state.verification_result = verification
         st.session_state.project = {
             "definition": definition,
-            "data": df
+            "data": df,
+            "clean_data": clean_df,
+            "chaos": overlay
         }
 
         # Update history with the new project title and anchor
-        new_history_item = f"{definition.get('title', '')} ({definition.get('recipe', {}).get('anchor_entity', {}).get('name', '')})"
-        st.session_state.generated_history.append(new_history_item)
+        st.session_state.generated_history.append(project_generator.history_item(definition))
 
         # Put data in global session state and scope
         st.session_state['project_data'] = df
+        st.session_state.dataset_memory = memory_report(df)
         init_notebook_state()
 
         # Initialize chat
@@ -961,7 +904,8 @@ def get_python_completions():
     scope = st.session_state.get('notebook_scope', {})
     for var_name, var_val in scope.items():
         if var_name.startswith('_'): continue
-        meta_type = type(var_val).__name__
+        # SQL results become DataFrames when Python code uses them
+        meta_type = "DataFrame" if isinstance(var_val, SQLResult) else type(var_val).__name__
 
         # Add variable itself
         completions.append({
@@ -972,7 +916,7 @@ def get_python_completions():
         })
 
         # If it's a dataframe, add columns
-        if isinstance(var_val, pd.DataFrame):
+        if isinstance(var_val, (pd.DataFrame, SQLResult)):
             for col in var_val.columns:
                 col_str = str(col)
                 # Add as string literal (useful for df['...'])
@@ -1109,15 +1053,15 @@ def render_floating_chat():
 
                 code_context = {"notebook": notebook_context}
 
-                # Call LLM
-                with st.spinner("Thinking..."):
-                     response = llm_service.generate_text(
+                # Call LLM, rendering the answer as it streams in
+                with chat_container.chat_message("assistant"):
+                    response = st.write_stream(llm_service.generate_text_stream(
                         prompt=st.session_state.messages[-1]["content"],
                         api_key=st.session_state.api_key,
                         project_context=definition,
                         code_context=code_context,
                         history=st.session_state.messages[:-2] # History excluding current msg
-                    )
+                    ))
                 st.session_state.messages.append({"role": "assistant", "content": response})
                 st.session_state.processing_chat = False
                 st.rerun()
@@ -1299,7 +1243,7 @@ def render_notebook():
 
                     # Result Object Display
                     if cell.get('result') is not None:
-                        st.dataframe(cell['result'])
+                        render_sql_result(cell['id'], cell['result'])
 
         # Render "Add" control after this cell (which corresponds to idx + 1)
         render_add_cell_controls(idx + 1)
@@ -1357,6 +1301,15 @@ def start_generation_callback():
             # I'll stick to allowing it but maybe showing a toast.
             st.toast("Starting in Mock Mode (No API Key detected)", icon="⚠️")
 
+        # Take a ready project from the pool if there is one the user hasn't seen yet
+        pooled = project_pool.pop(
+            st.session_state.sector_input,
+            exclude=st.session_state.generated_history,
+            rows=st.session_state.dataset_rows
+        )
+        if pooled is not None:
+            st.session_state.pooled_project = pooled
+
         st.session_state.generation_phase = 'generating'
     else:
         st.session_state['generation_error'] = "Please enter a sector."
@@ -1409,6 +1362,24 @@ def render_landing():
                 else:
                     st.info("Enter key for custom projects. Leave empty for Mock Mode.")
 
+                st.toggle(
+                    "Fast generation",
+                    value=st.session_state.speculative_generation,
+                    key="speculative_toggle",
+                    on_change=lambda: st.session_state.update({"speculative_generation": st.session_state.speculative_toggle}),
+                    help=f"Designs {SPECULATIVE_CANDIDATES} data recipes in parallel and keeps the first one that passes verification. Faster when a recipe needs fixing, but uses more API calls."
+                )
+
+                st.select_slider(
+                    "Dataset rows",
+                    options=DATASET_ROW_OPTIONS,
+                    value=st.session_state.dataset_rows,
+                    key="dataset_rows_slider",
+                    format_func=lambda n: f"{n:,}",
+                    on_change=lambda: st.session_state.update({"dataset_rows": st.session_state.dataset_rows_slider}),
+                    help="Size of the generated dataset. Larger datasets take longer to generate and use more memory."
+                )
+
                 st.divider()
                 st.markdown("### 📂 Restore Session")
                 st.file_uploader(
@@ -1422,14 +1393,7 @@ def render_landing():
         # Quick Start Pills
         st.markdown("") # Spacer
         cols = st.columns(4)
-        quick_starts = [
-            ("🛍️ Retail", "Retail"),
-            ("🏥 Healthcare", "Healthcare"),
-            ("💰 Finance", "Finance"),
-            ("💻 Tech", "Technology")
-        ]
-
-        for i, (label, value) in enumerate(quick_starts):
+        for i, (label, value) in enumerate(QUICK_STARTS):
             with cols[i]:
                 st.button(label, use_container_width=True, on_click=trigger_quick_start, args=(value,))
 
@@ -1521,6 +1485,10 @@ def render_workspace():
             st.subheader("Data Preview")
             st.dataframe(df.head(), use_container_width=True)
 
+            mem = st.session_state.get('dataset_memory')
+            if mem:
+                st.caption(f"In memory: {mem['total_bytes'] / 1e6:.1f} MB ({mem['saved_ratio']:.0%} smaller than uncompacted columns)")
+
             # Download
             csv = df.to_csv(index=False).encode('utf-8')
 
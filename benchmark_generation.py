@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from services.generator import project_generator, chaos
+from services.recipe_plan import compile_recipe
+from services.faker_pool import faker_pool, UNIQUE_METHODS
+from services.llm import LLMService
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Fixed schema-first recipes covering every column kind the generator knows about
+SCHEMA_FIXTURES = {
+    "retail_orders": {"schema_list": [
+        {"name": "order_id", "type": "id", "faker_method": "uuid4"},
+        {"name": "Customer Name", "type": "text", "faker_method": "name"},
+        {"name": "store_city", "type": "text", "faker_method": "city"},
+        {"name": "product", "type": "anchor", "options": ["Laptop", "Phone", "Tablet", "Monitor"], "weights": [0.4, 0.3, 0.2, 0.1]},
+        {"name": "region", "type": "categorical", "options": ["North", "South", "East", "West"]},
+        {"name": "order_date", "type": "date", "range_start": "2023-01-01", "range_end": "2024-12-31"},
+        {"name": "ship_date", "type": "date", "depends_on": "order_date", "offset_days_min": 1, "offset_days_max": 10},
+        {"name": "quantity", "type": "numeric", "min": 1, "max": 20},
+        {"name": "discount", "type": "numeric", "min": 0.0, "max": 0.3},
+        {"name": "unit_price", "type": "numeric", "rules": {"Laptop": {"min": 800, "max": 2500}, "Phone": {"min": 300, "max": 1200}, "Tablet": {"min": 200, "max": 900}, "Monitor": {"min": 150, "max": 700}}},
+        {"name": "is_returned", "type": "boolean", "probability": 0.08},
+        {"name": "has_warranty", "type": "boolean", "rules": {"Laptop": 0.7, "Phone": 0.5, "Tablet": 0.3, "Monitor": 0.2}},
+    ]},
+    "clinic_visits": {"schema_list": [
+        {"name": "visit_id", "type": "id", "faker_method": "uuid4"},
+        {"name": "patient_email", "type": "text", "faker_method": "email"},
+        {"name": "department", "type": "categorical", "options": ["Cardiology", "Oncology", "Pediatrics", "Radiology", "ER"]},
+        {"name": "visit_date", "type": "date", "range_start": "2022-06-01", "range_end": "2023-06-01"},
+        {"name": "wait_minutes", "type": "numeric", "min": 0, "max": 240},
+        {"name": "bill_amount", "type": "numeric", "min": 50.0, "max": 5000.0},
+    ]},
+}
+
+CHAOS_ATTACKS = ["plan_rogue_strings", "plan_date_confusion", "plan_nulls"]
+
+
+def check_fixtures(fixtures):
+    """Every fixture must compile cleanly, or a case silently benchmarks a fallback instead of its rules."""
+    for fixture_name, recipe in fixtures.items():
+        plan = compile_recipe(recipe)
+        if plan.issues:
+            sys.exit(f"Fixture '{fixture_name}' does not compile cleanly: " + "; ".join(plan.issues))
+        missing_rules = [spec.name for spec in plan.columns if spec.rules is not None and not spec.rules]
+        if missing_rules:
+            sys.exit(f"Fixture '{fixture_name}' has conditional columns without usable rules: {', '.join(missing_rules)}")
+
+
+def measure(fn, track_memory: bool):
+    """
+    Runs `fn` and returns (result, seconds, peak traced bytes or None).
+    tracemalloc slows down every Python-level allocation, so the timed run is untraced and
+    peak memory comes from a second, traced run.
+    """
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if track_memory:
+        del result
+        tracemalloc.start()
+        try:
+            result = fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def record(results, suite, name, rows, seconds, peak):
+    results.append({
+        "suite": suite,
+        "name": name,
+        "rows": rows,
+        "seconds": round(seconds, 6),
+        "rows_per_second": round(rows / seconds) if seconds else None,
+        "peak_bytes": peak,
+    })
+    peak_text = f"{peak / 1024 / 1024:9.1f} MB" if peak is not None else "        n/a"
+    print(f"{suite:<10} {name:<40} {rows:>11,} rows {seconds:9.3f} s {peak_text}")
+
+
+def warm_faker_pools(results, fixtures):
+    """
+    Fills every Faker pool the fixtures use up to its maximum size. This is a one-off cost per
+    process; timing it separately keeps it out of whichever column happens to run first.
+    """
+    methods = sorted({spec.faker_method for recipe in fixtures.values() for spec in compile_recipe(recipe).columns
+                      if spec.kind == 'faker' and spec.faker_method not in UNIQUE_METHODS})
+    for method in methods:
+        # Not traced: a second run would just hit the filled pool
+        _, seconds, peak = measure(lambda: faker_pool.get_pool(method, faker_pool.max_pool_size), False)
+        record(results, "warmup", f"faker_pool.{method}", faker_pool.max_pool_size, seconds, peak)
+
+
+def bench_columns(results, fixtures, rows, seed, track_memory):
+    """Times each column of each fixture on its own, in plan order (dependencies filled first)."""
+    for fixture_name, recipe in fixtures.items():
+        plan = compile_recipe(recipe)
+        rng = np.random.default_rng(seed)
+        data = {}
+        for spec in plan.columns:
+            values, seconds, peak = measure(lambda: project_generator._generate_column(spec, rows, rng, data), track_memory)
+            data[spec.name] = values
+            kind = f"conditional_{spec.kind}" if spec.conditional else spec.kind
+            record(results, "column", f"{fixture_name}.{spec.name} ({kind})", rows, seconds, peak)
+
+
+def bench_datasets(results, fixtures, rows, seed, track_memory):
+    """Times whole clean datasets, returned for the chaos suite."""
+    frames = {}
+    for fixture_name, recipe in fixtures.items():
+        df, seconds, peak = measure(
+            lambda: project_generator.generate_dataset(recipe, rows=rows, apply_simulation_chaos=False, seed=seed, use_cache=False),
+            track_memory,
+        )
+        frames[fixture_name] = df
+        record(results, "dataset", fixture_name, rows, seconds, peak)
+    return frames
+
+
+def bench_chaos(results, fixtures, frames, rows, seed, track_memory):
+    """Times each attack on a matching column (plan + apply), then the full randomized pass."""
+    for fixture_name, recipe in fixtures.items():
+        df = frames[fixture_name]
+        col_types = compile_recipe(recipe).col_types
+        targets = {
+            "plan_rogue_strings": next((c for c, t in col_types.items() if t == 'numeric'), None),
+            "plan_date_confusion": next((c for c, t in col_types.items() if t == 'date'), None),
+            "plan_nulls": df.columns[0] if len(df.columns) else None,
+        }
+        for attack in CHAOS_ATTACKS:
+            col = targets[attack]
+            if col is None:
+                continue
+            rng = np.random.default_rng(seed)
+            planner = getattr(chaos, attack)
+            _, seconds, peak = measure(lambda: planner(df, col, 0.05, rng).apply(df[col]), track_memory)
+            record(results, "chaos", f"{fixture_name}.{attack}({col})", rows, seconds, peak)
+
+        _, seconds, peak = measure(lambda: project_generator.apply_chaos_to_data(df, recipe, seed=seed), track_memory)
+        record(results, "chaos", f"{fixture_name}.apply_chaos", rows, seconds, peak)
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """Returns the entries that are more than `tolerance` slower (or larger) than the baseline."""
+    with open(baseline_path) as f:
+        baseline = {(r["suite"], r["name"], r["rows"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in results:
+        old = baseline.get((r["suite"], r["name"], r["rows"]))
+        if not old:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if old.get(metric) and r.get(metric) and r[metric] > old[metric] * (1 + tolerance):
+                regressions.append({**r, "metric": metric, "baseline": old[metric], "current": r[metric]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dataset generation and chaos injection at increasing row counts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Row counts to benchmark.")
+    parser.add_argument("--suites", nargs="+", choices=["column", "dataset", "chaos"], default=["column", "dataset", "chaos"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced second run (no peak_bytes).")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Previous results file; exit non-zero on regressions against it.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown/growth vs the baseline (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    fixtures = {"mock_legacy": LLMService()._mock_response("")["recipe"], **SCHEMA_FIXTURES}
+    track_memory = not args.no_memory
+    results = []
+
+    check_fixtures(fixtures)
+    warm_faker_pools(results, fixtures)
+    for rows in args.sizes:
+        if "column" in args.suites:
+            bench_columns(results, fixtures, rows, args.seed, track_memory)
+        if "dataset" in args.suites or "chaos" in args.suites:
+            frames = bench_datasets(results, fixtures, rows, args.seed, track_memory)
+            if "chaos" in args.suites:
+                bench_chaos(results, fixtures, frames, rows, args.seed, track_memory)
+            del frames
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "memory_tracked": track_memory,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['suite']} {r['name']} @ {r['rows']:,} rows: {r['metric']} {r['baseline']} -> {r['current']}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
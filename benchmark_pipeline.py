@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+# Replay recorded LLM responses unless told otherwise; must be set before the services import
+os.environ.setdefault("LLM_BACKEND", "replay")
+
+import numpy as np
+import pandas as pd
+
+from services.generator import project_generator, DEFAULT_ROWS
+from services.verifier import VerifierService
+from services.compact import memory_report
+from services.llm_cache import llm_cache
+from services.llm_metrics import llm_metrics
+from services.llm_replay import llm_backend
+from services.llm_throttle import llm_rate_limiter
+
+DEFAULT_SECTORS = ["Retail", "Healthcare", "Finance"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, round(q * len(values) + 0.5) - 1))] if values else None
+
+
+def run_pipeline(sector, api_key, verifier, history, rows, speculative):
+    """
+    The steps render_loading_screen runs for a new project (without the quick-start pool),
+    returning (step name, seconds) pairs. Pipeline steps are timed between on_stage labels.
+    """
+    steps = []
+    marks = []
+
+    def on_stage(label):
+        marks.append((label.rstrip('.'), time.perf_counter()))
+
+    start = time.perf_counter()
+    result = project_generator.build_verified_project(
+        sector, api_key, verifier,
+        previous_context=history[-5:],
+        rows=rows,
+        speculative_candidates=speculative,
+        on_stage=on_stage,
+    )
+    end = time.perf_counter()
+    for (label, started), (_, finished) in zip(marks, marks[1:] + [(None, end)]):
+        steps.append((label, finished - started))
+    if "error" in result:
+        return steps, result["error"], None
+
+    definition, df = result["definition"], result["data"]
+    chaos_start = time.perf_counter()
+    overlay = project_generator.plan_chaos(df, definition)
+    overlay.materialize(df)
+    steps.append(("Applying Chaos", time.perf_counter() - chaos_start))
+
+    report_start = time.perf_counter()
+    memory_report(df)
+    steps.append(("Memory Report", time.perf_counter() - report_start))
+    steps.append(("Total", time.perf_counter() - start))
+
+    history.append(project_generator.history_item(definition))
+    return steps, None, result["verification"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the full project pipeline (narrative -> recipe -> data -> verify -> chaos) against recorded LLM responses.")
+    parser.add_argument("--sectors", nargs="+", default=DEFAULT_SECTORS)
+    parser.add_argument("--runs", type=int, default=3, help="Projects generated per sector.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--speculative", type=int, default=0, help="Recipe candidates per project (0 = sequential refine loop).")
+    parser.add_argument("--latency-scale", type=float, help="Multiplier for recorded latencies (0 = instant).")
+    parser.add_argument("--latency-ms", type=float, help="Fixed latency per replayed call, instead of the recorded one.")
+    parser.add_argument("--failure-rate", type=float, help="Share of replayed calls failing with a retryable error.")
+    parser.add_argument("--seed", type=int, help="Seed for injected failures.")
+    parser.add_argument("--rate-per-minute", type=float, default=6000, help="LLM rate limit per key during the run.")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the LLM response cache on.")
+    parser.add_argument("--output", default="benchmark_pipeline_results.json", help="Where to write the JSON results.")
+    args = parser.parse_args()
+
+    if llm_backend is not None:
+        if args.latency_scale is not None:
+            llm_backend.latency_scale = args.latency_scale
+        if args.latency_ms is not None:
+            llm_backend.latency_ms = args.latency_ms
+        if args.failure_rate is not None:
+            llm_backend.failure_rate = args.failure_rate
+        if args.seed is not None:
+            llm_backend.seed = args.seed
+        llm_backend.reset()
+    llm_cache.enabled = args.with_cache
+    llm_rate_limiter.per_minute = args.rate_per_minute
+    llm_metrics.reset()
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    verifier = VerifierService()
+    results = []
+    for sector in args.sectors:
+        history = []
+        for run in range(args.runs):
+            steps, error, verification = run_pipeline(sector, api_key, verifier, history, args.rows, args.speculative)
+            results.append({
+                "sector": sector,
+                "run": run,
+                "steps": {name: round(seconds, 6) for name, seconds in steps},
+                "error": error,
+                "valid": None if verification is None else verification.get("valid", True),
+            })
+            total = dict(steps).get("Total")
+            status = f"error: {error}" if error else f"valid={results[-1]['valid']}"
+            print(f"{sector:<12} run {run + 1}/{args.runs} {total if total is not None else float('nan'):8.3f} s  {status}")
+
+    step_names = list(dict.fromkeys(name for r in results for name in r["steps"]))
+    summary = {}
+    for name in step_names:
+        values = [r["steps"][name] for r in results if name in r["steps"]]
+        summary[name] = {"count": len(values), "p50_s": percentile(values, 0.5), "p95_s": percentile(values, 0.95)}
+        print(f"{name:<40} n={len(values):<4} p50 {summary[name]['p50_s']:8.3f} s  p95 {summary[name]['p95_s']:8.3f} s")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "backend": {
+            "mode": llm_backend.mode if llm_backend is not None else "live",
+            "fixtures_dir": getattr(llm_backend, "fixtures_dir", None),
+            "latency_scale": getattr(llm_backend, "latency_scale", None),
+            "latency_ms": getattr(llm_backend, "latency_ms", None),
+            "failure_rate": getattr(llm_backend, "failure_rate", None),
+            "seed": getattr(llm_backend, "seed", None),
+        },
+        "rows": args.rows,
+        "speculative": args.speculative,
+        "steps": summary,
+        "llm_stages": llm_metrics.summary(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} pipeline runs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
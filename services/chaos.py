@@ -1,109 +1,209 @@
 import pandas as pd
 import numpy as np
-import random
+from dataclasses import dataclass
+
+DATE_FORMATS = ['%d/%m/%Y', '%m-%d-%Y', '%Y.%m.%d']
+
+
+def format_dates(column: pd.Series, fmt: str, positions: np.ndarray = None) -> np.ndarray:
+    """
+    Formats a date column (datetime64 or date objects) as strings, as an object array.
+    Values that aren't dates (nulls, rogue strings) are returned unchanged.
+
+    A date column spans far fewer days than it has rows, so every day in the span is
+    formatted once and rows are filled by day-offset lookup instead of per-row strftime.
+    With `positions`, only those rows are formatted and returned.
+    """
+    if positions is not None:
+        column = column.iloc[positions]
+    days = pd.to_datetime(column, errors='coerce', format='mixed').to_numpy(dtype='datetime64[D]')
+    missing = np.isnat(days)
+    # Only box the rows that stay as they are; boxing a whole datetime64 column is the slow part
+    values = np.empty(len(column), dtype=object)
+    values[missing] = column.iloc[np.flatnonzero(missing)].to_numpy(dtype=object)
+    if missing.all():
+        return values
+
+    day_numbers = days.astype(np.int64)
+    first = day_numbers[~missing].min()
+    last = day_numbers[~missing].max()
+    span = pd.DatetimeIndex(np.arange(first, last + 1).astype('datetime64[D]'))
+    lookup = np.asarray(span.strftime(fmt), dtype=object)
+    values[~missing] = lookup[day_numbers[~missing] - first]
+    return values
+
+
+@dataclass(slots=True)
+class ChaosPatch:
+    """
+    One attack on one column: the rows it touched (positions) and the values it injected.
+    `cast` is how the rest of the column changes so it can hold them:
+    'object' (keep values, as Python objects), 'date_text' (dates rendered as ISO text)
+    or 'nullable' (same dtype family, with nulls).
+    """
+    column: str
+    positions: np.ndarray
+    values: np.ndarray
+    cast: str
+
+    def apply(self, series: pd.Series) -> pd.Series:
+        if self.cast == 'nullable':
+            mask = np.zeros(len(series), dtype=bool)
+            mask[self.positions] = True
+            if pd.api.types.is_bool_dtype(series.dtype):
+                # Plain bool can't hold nulls; the nullable 'boolean' dtype avoids falling back to object
+                series = series.astype('boolean')
+            return series.mask(mask)
+
+        if self.cast == 'date_text':
+            values = format_dates(series, '%Y-%m-%d')
+        else:
+            values = series.to_numpy(dtype=object, copy=True)
+        values[self.positions] = self.values
+        return pd.Series(values, index=series.index, name=series.name)
+
+
+class ChaosOverlay:
+    """
+    Chaos kept as a sparse patch set next to the clean dataset, instead of a mutated copy.
+
+    `materialize` builds the dirty view: untouched columns are shared with the clean frame,
+    so holding both views costs one extra copy of the attacked columns only.
+    `diff` lists the changed cells in O(patched cells).
+    """
+
+    def __init__(self, patches: list = None):
+        self.patches = patches or []
+
+    def __len__(self):
+        return sum(len(p.positions) for p in self.patches)
+
+    @property
+    def columns(self) -> list:
+        return list(dict.fromkeys(p.column for p in self.patches))
+
+    def materialize(self, clean: pd.DataFrame) -> pd.DataFrame:
+        dirty = clean.copy(deep=False)
+        for col in self.columns:
+            series = clean[col]
+            for patch in self.patches:
+                if patch.column == col:
+                    series = patch.apply(series)
+            dirty[col] = series
+        return dirty
+
+    def diff(self, clean: pd.DataFrame) -> pd.DataFrame:
+        """One row per changed cell: row label, column, clean value and injected value."""
+        frames = []
+        for patch in self.patches:
+            frames.append(pd.DataFrame({
+                'row': clean.index[patch.positions],
+                'column': patch.column,
+                'clean_value': clean[patch.column].iloc[patch.positions].to_numpy(dtype=object),
+                'dirty_value': patch.values,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['row', 'column', 'clean_value', 'dirty_value'])
+        # A cell hit by several attacks shows its final value
+        return pd.concat(frames, ignore_index=True).drop_duplicates(['row', 'column'], keep='last')
+
 
 class ChaosToolkit:
     """
     Introduces realistic data quality issues into a clean dataframe.
+
+    Every attack picks its rows once as positions and records a ChaosPatch; applying it
+    works on whole arrays (masked assignment, per-format lookup tables), so the cost is
+    a few array operations per attacked column rather than Python work per row.
     """
 
-    def inject_rogue_strings(self, df: pd.DataFrame, col_name: str, ratio: float = 0.05):
+    ROGUE_VALUES = np.array(["TBD", "Error", "null", "N/A", "???", "$$$"], dtype=object)
+    DATE_FORMATS = DATE_FORMATS
+
+    def _pick_rows(self, n_rows: int, ratio: float, rng: np.random.Generator) -> np.ndarray:
+        n_picked = int(n_rows * ratio)
+        if n_picked <= 0:
+            return np.empty(0, dtype=np.intp)
+        return rng.choice(n_rows, n_picked, replace=False)
+
+    def plan_rogue_strings(self, df: pd.DataFrame, col_name: str, ratio: float, rng: np.random.Generator) -> ChaosPatch:
+        positions = self._pick_rows(len(df), ratio, rng)
+        values = self.ROGUE_VALUES[rng.integers(0, len(self.ROGUE_VALUES), size=len(positions))]
+        return ChaosPatch(col_name, positions, values, 'object')
+
+    def plan_date_confusion(self, df: pd.DataFrame, col_name: str, ratio: float, rng: np.random.Generator) -> ChaosPatch:
+        positions = self._pick_rows(len(df), ratio, rng)
+        values = np.empty(len(positions), dtype=object)
+        # Bucket the selected rows by their random format and format each bucket in one lookup
+        formats = rng.integers(0, len(self.DATE_FORMATS), size=len(positions))
+        for fmt_idx, fmt in enumerate(self.DATE_FORMATS):
+            bucket = formats == fmt_idx
+            if bucket.any():
+                values[bucket] = format_dates(df[col_name], fmt, positions[bucket])
+        return ChaosPatch(col_name, positions, values, 'date_text')
+
+    def plan_nulls(self, df: pd.DataFrame, col_name: str, ratio: float, rng: np.random.Generator) -> ChaosPatch:
+        positions = self._pick_rows(len(df), ratio, rng)
+        return ChaosPatch(col_name, positions, np.full(len(positions), np.nan, dtype=object), 'nullable')
+
+    def inject_rogue_strings(self, df: pd.DataFrame, col_name: str, ratio: float = 0.05, rng: np.random.Generator = None):
         """
         Forces a numeric column to object type by inserting rogue values like 'TBD', 'Error', '$'.
         """
-        if col_name not in df.columns:
-            return df
+        return self._inject(self.plan_rogue_strings, df, col_name, ratio, rng)
 
-        # Ensure column is object type to accept strings
-        df[col_name] = df[col_name].astype(object)
-
-        rogue_values = ["TBD", "Error", "null", "N/A", "???", "$$$"]
-        n_rows = len(df)
-        n_rogue = int(n_rows * ratio)
-
-        if n_rogue > 0:
-            indices = np.random.choice(df.index, n_rogue, replace=False)
-            df.loc[indices, col_name] = np.random.choice(rogue_values, n_rogue)
-
-        return df
-
-    def inject_date_confusion(self, df: pd.DataFrame, col_name: str, ratio: float = 0.1):
+    def inject_date_confusion(self, df: pd.DataFrame, col_name: str, ratio: float = 0.1, rng: np.random.Generator = None):
         """
         Mixes date formats in a date column (e.g. YYYY-MM-DD vs DD/MM/YYYY).
+        The column becomes text: ISO for untouched rows, alternative formats for the selected ones.
         """
-        if col_name not in df.columns:
-            return df
+        return self._inject(self.plan_date_confusion, df, col_name, ratio, rng)
 
-        # Ensure it's treated as object/string for mixed formatting
-        df[col_name] = df[col_name].astype(object)
-
-        n_rows = len(df)
-        n_confused = int(n_rows * ratio)
-
-        if n_confused > 0:
-            indices = np.random.choice(df.index, n_confused, replace=False)
-
-            # Assuming values are already date objects or strings.
-            # If they are date objects, we format them.
-            # If they are strings, we might need to parse first, but let's assume valid generation first.
-
-            def confuse_date(val):
-                if pd.isna(val): return val
-                try:
-                    # If it's a timestamp/date
-                    if hasattr(val, 'strftime'):
-                        # Return US format or swapped day/month randomly
-                        formats = ['%d/%m/%Y', '%m-%d-%Y', '%Y.%m.%d']
-                        return val.strftime(random.choice(formats))
-                    # If it's a string, leave it (or try to parse? simpler to assume date obj input)
-                    return val
-                except:
-                    return val
-
-            # Apply confusion
-            # We can't vectorise easily with random choice per row without apply,
-            # or we split indices by format.
-            # Simple apply for the selected indices:
-            df.loc[indices, col_name] = df.loc[indices, col_name].apply(confuse_date)
+    def inject_nulls(self, df: pd.DataFrame, col_name: str, ratio: float = 0.05, rng: np.random.Generator = None):
+        """
+        Blanks out a share of a column. Columns keep their dtype family (integers become float,
+        booleans become nullable booleans), so no object copy is made.
+        """
+        return self._inject(self.plan_nulls, df, col_name, ratio, rng)
 
+    def _inject(self, planner, df: pd.DataFrame, col_name: str, ratio: float, rng: np.random.Generator):
+        if col_name not in df.columns:
+            return df
+        patch = planner(df, col_name, ratio, rng or np.random.default_rng())
+        if len(patch.positions):
+            df[col_name] = patch.apply(df[col_name])
         return df
 
-    def apply_chaos(self, df: pd.DataFrame, recipe_columns: dict) -> pd.DataFrame:
+    def plan_chaos(self, df: pd.DataFrame, recipe_columns: dict, rng: np.random.Generator = None) -> ChaosOverlay:
         """
-        Randomly selects attacks to run on the dataframe based on available column types.
+        Randomly selects attacks to run on the dataframe based on available column types,
+        and returns them as a ChaosOverlay without touching `df`.
         recipe_columns: dict of col_name -> type ('numeric', 'date', etc.)
         """
-        # Identify candidates
-        numeric_cols = [c for c, t in recipe_columns.items() if t in ['numeric', 'integer', 'float']]
-        date_cols = [c for c, t in recipe_columns.items() if t in ['date', 'datetime']]
+        rng = rng or np.random.default_rng()
+
+        # Identify candidates (only columns that actually exist in the frame)
+        numeric_cols = [c for c, t in recipe_columns.items() if t in ['numeric', 'integer', 'float'] and c in df.columns]
+        date_cols = [c for c, t in recipe_columns.items() if t in ['date', 'datetime'] and c in df.columns]
 
-        attacks = []
+        patches = []
 
         # 1. Random numeric corruption
-        if numeric_cols and random.random() < 0.7: # 70% chance
-            target = random.choice(numeric_cols)
-            attacks.append(lambda d: self.inject_rogue_strings(d, target, ratio=0.03))
+        if numeric_cols and rng.random() < 0.7: # 70% chance
+            patches.append(self.plan_rogue_strings(df, numeric_cols[rng.integers(len(numeric_cols))], 0.03, rng))
 
         # 2. Date format confusion
-        if date_cols and random.random() < 0.6:
-            target = random.choice(date_cols)
-            attacks.append(lambda d: self.inject_date_confusion(d, target, ratio=0.05))
+        if date_cols and rng.random() < 0.6:
+            patches.append(self.plan_date_confusion(df, date_cols[rng.integers(len(date_cols))], 0.05, rng))
 
         # 3. Random Nulls (Classic)
-        # We can still add general nulls
-        if random.random() < 0.8:
-            def inject_nulls(d):
-                cols = list(d.columns)
-                target = random.choice(cols)
-                n_rows = len(d)
-                n_nulls = int(n_rows * 0.05)
-                indices = np.random.choice(d.index, n_nulls, replace=False)
-                d.loc[indices, target] = np.nan
-                return d
-            attacks.append(inject_nulls)
-
-        # Apply selected attacks
-        for attack in attacks:
-            df = attack(df)
+        if len(df.columns) and rng.random() < 0.8:
+            patches.append(self.plan_nulls(df, df.columns[rng.integers(len(df.columns))], 0.05, rng))
 
-        return df
+        return ChaosOverlay([p for p in patches if len(p.positions)])
+
+    def apply_chaos(self, df: pd.DataFrame, recipe_columns: dict, rng: np.random.Generator = None) -> pd.DataFrame:
+        """
+        Returns the dirty version of `df` (see plan_chaos). Untouched columns are shared with `df`.
+        """
+        return self.plan_chaos(df, recipe_columns, rng).materialize(df)
@@ -0,0 +1,86 @@
+import sys
+import numpy as np
+import pandas as pd
+
+# Signed widths in increasing size. Categorical codes must be signed (-1 marks a missing value).
+INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def smallest_int_dtype(low: int, high: int):
+    """Returns the narrowest signed integer dtype that can hold every value in [low, high]."""
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return np.int64
+
+
+def safe_int_dtype(low: int, high: int):
+    """
+    Narrowest integer dtype for a generated numeric column.
+    NumPy integer arithmetic wraps silently, so the dtype must also hold the product of two
+    values from the range (e.g. price * quantity), not just the range itself.
+    """
+    bound = max(abs(int(low)), abs(int(high)))
+    return smallest_int_dtype(-bound * bound, bound * bound)
+
+
+def categorical_column(options: list, rows: int, rng: np.random.Generator, weights: list = None) -> pd.Categorical:
+    """
+    Draws a categorical column as integer codes and wraps them in a pandas Categorical,
+    so the option strings are stored once instead of once per row.
+    """
+    # Categories must be unique; merge the weights of duplicated options
+    categories = list(dict.fromkeys(options))
+    if len(categories) != len(options):
+        if weights:
+            merged = dict.fromkeys(categories, 0.0)
+            for opt, w in zip(options, weights):
+                merged[opt] += w
+            weights = list(merged.values())
+        else:
+            # Keep the original frequencies (duplicates were effectively weighted up)
+            weights = [options.count(c) / len(options) for c in categories]
+
+    if weights:
+        weights = np.asarray(weights, dtype=float)
+        weights = weights / weights.sum()
+    else:
+        weights = None
+
+    code_dtype = smallest_int_dtype(-1, len(categories) - 1)
+    codes = rng.choice(len(categories), size=rows, p=weights).astype(code_dtype)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def memory_report(df: pd.DataFrame) -> dict:
+    """
+    Per-column memory usage of a dataset, compared with the uncompacted layout
+    (Python strings in object columns for categoricals, int64 for integers).
+    """
+    columns = {}
+    total_bytes = 0
+    baseline_bytes = 0
+    for col in df.columns:
+        series = df[col]
+        actual = int(series.memory_usage(index=False, deep=True))
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # One 8-byte pointer per row plus one string object per row
+            counts = series.value_counts(sort=False)
+            baseline = 8 * len(series) + sum(sys.getsizeof(cat) * int(n) for cat, n in counts.items())
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            baseline = 8 * len(series)
+        else:
+            baseline = actual
+        columns[str(col)] = {"dtype": str(series.dtype), "bytes": actual, "baseline_bytes": baseline}
+        total_bytes += actual
+        baseline_bytes += baseline
+
+    return {
+        "rows": len(df),
+        "total_bytes": total_bytes,
+        "baseline_bytes": baseline_bytes,
+        "saved_bytes": baseline_bytes - total_bytes,
+        "saved_ratio": (baseline_bytes - total_bytes) / baseline_bytes if baseline_bytes else 0.0,
+        "columns": columns,
+    }
@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+import threading
+import uuid
+import pandas as pd
+
+# Bump whenever generation logic changes, so stale datasets are never served.
+CACHE_VERSION = 4
+
+# Keys of a legacy recipe that affect the generated data
+LEGACY_RECIPE_KEYS = ['anchor_entity', 'categorical_columns', 'date_columns', 'numeric_columns', 'faker_columns', 'correlated_columns']
+
+
+def canonicalize_recipe(recipe: dict) -> dict:
+    """
+    Reduces a recipe (schema-first definition, full legacy definition or bare legacy recipe)
+    to the parts that drive generation. Titles, tasks and column descriptions are dropped.
+    """
+    def strip_descriptions(value):
+        if isinstance(value, dict):
+            return {k: strip_descriptions(v) for k, v in value.items() if k != 'description'}
+        if isinstance(value, list):
+            return [strip_descriptions(v) for v in value]
+        return value
+
+    if recipe.get('schema_list'):
+        return {'schema_list': strip_descriptions(recipe['schema_list'])}
+
+    legacy = recipe.get('recipe', recipe)
+    return {k: strip_descriptions(legacy[k]) for k in LEGACY_RECIPE_KEYS if k in legacy}
+
+
+def recipe_fingerprint(recipe: dict) -> str:
+    canonical = json.dumps(canonicalize_recipe(recipe), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DatasetCache:
+    """
+    Content-addressed on-disk cache of clean (pre-chaos) datasets, stored as compressed Parquet.
+    Entries are keyed by recipe fingerprint, seed and row count, and evicted least-recently-used
+    first once the directory grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or os.getenv("DATASET_CACHE_DIR", os.path.join(".cache", "datasets"))
+        self.max_bytes = max_bytes or int(os.getenv("DATASET_CACHE_MAX_MB", "512")) * 1024 * 1024
+        self._lock = threading.Lock()
+
+    def make_key(self, recipe: dict, seed: int, rows: int) -> str:
+        payload = f"{CACHE_VERSION}:{recipe_fingerprint(recipe)}:{seed}:{rows}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key: str) -> pd.DataFrame:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(path)
+            return df
+        except Exception as e:
+            print(f"Error reading cached dataset {key}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temp file first so concurrent readers never see a partial file
+            tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.tmp")
+            df.to_parquet(tmp_path, compression='zstd', index=False)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Error caching dataset {key}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Deletes least-recently-used entries until the cache fits in max_bytes."""
+        with self._lock:
+            try:
+                entries = []
+                for name in os.listdir(self.cache_dir):
+                    if name.endswith('.parquet'):
+                        stat = os.stat(os.path.join(self.cache_dir, name))
+                        entries.append((stat.st_mtime, stat.st_size, name))
+            except OSError:
+                return
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(os.path.join(self.cache_dir, name))
+                total -= size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+dataset_cache = DatasetCache()
@@ -0,0 +1,113 @@
+import math
+import threading
+import zlib
+from datetime import date, datetime
+import numpy as np
+from faker import Faker
+
+# Methods whose values must stay unique per row. These bypass the pool.
+UNIQUE_METHODS = {'uuid4'}
+
+# Faker's "this year/month" methods depend on today's date. They are drawn relative to a fixed
+# reference date instead, so the same (recipe, seed, rows) gives the same data on any day.
+REFERENCE_DATE = date(2025, 6, 30)
+ANCHORED_METHODS = {
+    'date_this_year': lambda f: f.date_between_dates(REFERENCE_DATE.replace(month=1, day=1), REFERENCE_DATE),
+    'date_this_month': lambda f: f.date_between_dates(REFERENCE_DATE.replace(day=1), REFERENCE_DATE),
+    'date_time_this_year': lambda f: f.date_time_between_dates(datetime(REFERENCE_DATE.year, 1, 1), datetime.combine(REFERENCE_DATE, datetime.min.time())),
+    'date_time_this_month': lambda f: f.date_time_between_dates(datetime(REFERENCE_DATE.year, REFERENCE_DATE.month, 1), datetime.combine(REFERENCE_DATE, datetime.min.time())),
+}
+
+# Byte positions of the hex digits inside a canonical 36-char UUID string
+_UUID_HEX_SLOTS = np.array([i for i in range(36) if i not in (8, 13, 18, 23)])
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+
+def uuid4_array(rows: int, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Builds `rows` random version-4 UUID strings with NumPy only (no per-row Python).
+    """
+    rng = rng or np.random.default_rng()
+    raw = rng.integers(0, 256, size=(rows, 16), dtype=np.uint8)
+    # Version (4) and RFC 4122 variant bits
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+
+    nibbles = np.empty((rows, 32), dtype=np.uint8)
+    nibbles[:, 0::2] = raw >> 4
+    nibbles[:, 1::2] = raw & 0x0F
+
+    chars = np.full((rows, 36), ord('-'), dtype=np.uint8)
+    chars[:, _UUID_HEX_SLOTS] = _HEX_DIGITS[nibbles]
+    return chars.view('S36').ravel().astype('U36').astype(object)
+
+
+class FakerPool:
+    """
+    Caches a bounded pool of Faker values per provider method and fills columns
+    by sampling indices into it, so a column costs O(pool) Faker calls instead of O(rows).
+
+    Pools are shared by every session in the process and only ever grow, up to max_pool_size.
+    Each method has its own Faker instance seeded from the method name, so pool[:n] is the
+    same no matter how (or in which process) the pool was grown.
+    """
+
+    def __init__(self, max_pool_size: int = 5000, unique_ratio: float = 0.25):
+        """
+        Args:
+            max_pool_size (int): Upper bound on cached values per method.
+            unique_ratio (float): Target share of distinct values per column (pool size = rows * ratio).
+        """
+        self.max_pool_size = max_pool_size
+        self.unique_ratio = unique_ratio
+        self._probe = Faker()
+        self._fakers = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def supports(self, method: str) -> bool:
+        return bool(method) and callable(getattr(self._probe, method, None))
+
+    def pool_size(self, rows: int, unique_ratio: float = None) -> int:
+        ratio = self.unique_ratio if unique_ratio is None else unique_ratio
+        return max(1, min(self.max_pool_size, math.ceil(rows * ratio)))
+
+    def get_pool(self, method: str, size: int) -> np.ndarray:
+        """Returns the first `size` cached values for `method`, growing the pool if needed."""
+        with self._lock:
+            pool = self._pools.get(method)
+            if pool is None or len(pool) < size:
+                faker = self._fakers.get(method)
+                if faker is None:
+                    faker = Faker()
+                    faker.seed_instance(zlib.crc32(method.encode('utf-8')))
+                    self._fakers[method] = faker
+                existing = 0 if pool is None else len(pool)
+                make = ANCHORED_METHODS.get(method) or (lambda f: getattr(f, method)())
+                fresh = [make(faker) for _ in range(size - existing)]
+                grown = np.empty(size, dtype=object)
+                if existing:
+                    grown[:existing] = pool
+                grown[existing:] = fresh
+                self._pools[method] = pool = grown
+            return pool[:size]
+
+    def sample(self, method: str, rows: int, rng: np.random.Generator = None, unique_ratio: float = None) -> np.ndarray:
+        """
+        Fills a column of `rows` values for a Faker method.
+
+        Args:
+            method (str): Faker provider method (e.g. 'name', 'email', 'city').
+            rows (int): Number of values to produce.
+            rng (np.random.Generator): Source of randomness for index sampling.
+            unique_ratio (float): Overrides the pool's default distinct-value ratio for this column.
+        """
+        rng = rng or np.random.default_rng()
+        if method in UNIQUE_METHODS:
+            return uuid4_array(rows, rng)
+
+        pool = self.get_pool(method, self.pool_size(rows, unique_ratio))
+        return pool[rng.integers(0, len(pool), size=rows)]
+
+
+faker_pool = FakerPool()
@@ -1,17 +1,31 @@
 import pandas as pd
 import numpy as np
-from faker import Faker
+import pyarrow as pa
+import pyarrow.parquet as pq
 import random
-import json
-import re
-from datetime import datetime, timedelta
+import itertools
+import multiprocessing
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 from .llm import LLMService
-from .chaos import ChaosToolkit
+from .chaos import ChaosToolkit, ChaosOverlay
+from .faker_pool import faker_pool
+from .dataset_cache import dataset_cache, recipe_fingerprint
+from .compact import categorical_column, safe_int_dtype
+from .recipe_plan import compile_recipe, ColumnSpec
+
+DEFAULT_ROWS = 10000
+DEFAULT_CHUNK_SIZE = 250000
 
-fake = Faker()
 chaos = ChaosToolkit()
 llm_service = LLMService()
 
+# Threads for building speculative candidates' datasets. Like the LLM workers, this is a
+# dedicated pool so cancelled candidates never hold up asyncio.run() at shutdown.
+_candidate_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="candidate")
+
 class ProjectGenerator:
     def orchestrate_project_generation(self, sector: str, api_key: str = None, previous_context: list = None):
         """
@@ -131,10 +145,16 @@ class ProjectGenerator:
             "dataset_granularity": "Each row represents..."
         }}
         """
-        return llm_service.generate_json(prompt, api_key, temperature=0.95)
+        return llm_service.generate_json(prompt, api_key, temperature=0.95, use_cache=False, stage="narrative")
 
     def _generate_data_recipe(self, narrative: dict, api_key: str):
-        prompt = f"""
+        return llm_service.generate_json(self._data_recipe_prompt(narrative), api_key, temperature=0.8, use_cache=False, stage="recipe")
+
+    async def _agenerate_data_recipe(self, narrative: dict, api_key: str):
+        return await llm_service.agenerate_json(self._data_recipe_prompt(narrative), api_key, temperature=0.8, use_cache=False, stage="recipe")
+
+    def _data_recipe_prompt(self, narrative: dict) -> str:
+        return f"""
         Act as a Senior Data Architect.
         You have been given the following project scenario:
 
@@ -217,7 +237,6 @@ class ProjectGenerator:
             ]
         }}
         """
-        return llm_service.generate_json(prompt, api_key, temperature=0.8)
 
     def refine_data_recipe(self, narrative: dict, feedback: list, api_key: str):
         """
@@ -300,268 +319,161 @@ class ProjectGenerator:
             ]
         }}
         """
-        return llm_service.generate_json(prompt, api_key, temperature=0.5)
+        # Not cached: a repeated refine (same issues) must be able to produce a different recipe
+        return llm_service.generate_json(prompt, api_key, temperature=0.5, use_cache=False, stage="refine")
 
-    # Legacy wrapper for compatibility if needed
-    def generate_project_definition(self, sector: str, api_key: str = None, previous_context: list = None):
-        return self.orchestrate_project_generation(sector, api_key, previous_context)
+    def build_candidate_dataset(self, definition: dict, narrative: dict, rows: int = DEFAULT_ROWS):
+        """
+        Generates the clean dataset for a recipe returned by the LLM (schema-first or legacy),
+        filling in optional fields from the narrative and a dataset seed. Returns None for an unusable format.
+        """
+        # Optional fields the LLM left out fall back to the narrative
+        definition.setdefault('title', narrative.get('title', 'Untitled Project'))
+        definition.setdefault('description', narrative.get('description', ''))
+        definition.setdefault('tasks', [])
+
+        if 'schema_list' in definition:
+            # Inject granularity manually if missing from LLM output but present in narrative
+            if 'dataset_granularity' not in definition and 'dataset_granularity' in narrative:
+                definition['dataset_granularity'] = narrative['dataset_granularity']
+            recipe = definition
+        elif 'recipe' in definition:
+            # Legacy fallback
+            recipe = definition['recipe']
+        else:
+            return None
 
-    def _sanitize_column_name(self, name: str) -> str:
-        # Lowercase
-        name = name.lower()
-        # Replace spaces with underscores
-        name = name.replace(" ", "_")
-        # Remove non-alphanumeric (except underscore)
-        name = re.sub(r'[^a-z0-9_]', '', name)
-        # Ensure it doesn't start with a number
-        if name and name[0].isdigit():
-            name = "_" + name
-        return name
-
-    def _generate_dataset_legacy(self, recipe: dict, rows: int = 10000) -> pd.DataFrame:
-        """Legacy generation logic for backward compatibility."""
-        data = {}
+        definition.setdefault('dataset_seed', self.recipe_seed(definition))
+        return self.generate_dataset(recipe, rows=rows, apply_simulation_chaos=False, seed=definition['dataset_seed'])
 
-        # 1. Generate Anchor Column
-        anchor = recipe.get('anchor_entity', {})
-        anchor_name = self._sanitize_column_name(anchor.get('name', 'entity'))
-        options = anchor.get('options', ['Item A', 'Item B'])
-        weights = anchor.get('weights', [1.0/len(options)]*len(options))
+    async def speculative_recipe_search(self, narrative: dict, api_key: str, verifier, candidates: int = 3, rows: int = DEFAULT_ROWS) -> dict:
+        """
+        Requests `candidates` recipes concurrently, then generates and verifies each as soon as it
+        arrives. The first candidate that passes verification wins and the rest are cancelled.
+        If none pass, the best-scoring verified candidate is returned (or the last error).
 
-        # Normalize weights
+        Returns {"definition", "data", "verification"} or {"error": ...}.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def attempt():
+            definition = await self._agenerate_data_recipe(narrative, api_key)
+            if "error" in definition:
+                return definition
+            df = await loop.run_in_executor(_candidate_executor, self.build_candidate_dataset, definition, narrative, rows)
+            if df is None:
+                return {"error": "Invalid recipe format received from AI."}
+            verification = await verifier.averify_dataset_schema(definition, df, api_key)
+            return {"definition": definition, "data": df, "verification": verification}
+
+        tasks = [asyncio.create_task(attempt()) for _ in range(candidates)]
+        best = None
+        error = {"error": "No recipe candidate could be generated."}
         try:
-            weights = [float(w) for w in weights]
-            total_weight = sum(weights)
-            if abs(total_weight - 1.0) > 0.01:
-                weights = [w / total_weight for w in weights]
-        except:
-            weights = [1.0/len(options)] * len(options)
-
-        data[anchor_name] = np.random.choice(options, size=rows, p=weights)
-
-        # 2. Categorical
-        for col in recipe.get('categorical_columns', []):
-            col_name = self._sanitize_column_name(col['name'])
-            opts = col['options']
-            wts = col.get('weights', None)
-            if wts:
+            for next_done in asyncio.as_completed(tasks):
                 try:
-                    wts = [float(w) for w in wts]
-                    total = sum(wts)
-                    if abs(total - 1.0) > 0.01: wts = [w / total for w in wts]
-                except: wts = None
-            data[col_name] = np.random.choice(opts, size=rows, p=wts)
-
-        # 3. Dates
-        processed_dates = set()
-        pending_dates = [d for d in recipe.get('date_columns', [])]
-        loop_counter = 0
-        max_loops = len(pending_dates) * 2
-
-        while pending_dates and loop_counter < max_loops:
-            loop_counter += 1
-            col = pending_dates.pop(0)
-            col_name = self._sanitize_column_name(col['name'])
-            dtype = col.get('type', 'base')
-
-            if dtype == 'base':
-                start_str = col.get('range_start', '2023-01-01')
-                end_str = col.get('range_end', '2023-12-31')
-                try:
-                    start_date = datetime.strptime(start_str, "%Y-%m-%d")
-                    end_date = datetime.strptime(end_str, "%Y-%m-%d")
-                    delta = (end_date - start_date).days
-                    random_days = np.random.randint(0, delta + 1, size=rows)
-                    base = pd.to_datetime(start_date)
-                    data[col_name] = (base + pd.to_timedelta(random_days, unit='D')).date
-                    processed_dates.add(col_name)
-                except:
-                    data[col_name] = [fake.date_this_year() for _ in range(rows)]
-                    processed_dates.add(col_name)
-
-            elif dtype == 'dependent':
-                dependency = self._sanitize_column_name(col.get('depends_on', ''))
-                if dependency in data:
-                    min_off = col.get('offset_days_min', 0)
-                    max_off = col.get('offset_days_max', 30)
-                    offsets = np.random.randint(min_off, max_off + 1, size=rows)
-                    base_series = pd.to_datetime(pd.Series(data[dependency]))
-                    data[col_name] = (base_series + pd.to_timedelta(offsets, unit='D')).dt.date
-                    processed_dates.add(col_name)
-                else:
-                    pending_dates.append(col)
-
-        # 4. Numeric
-        for col in recipe.get('numeric_columns', []):
-            col_name = self._sanitize_column_name(col['name'])
-            data[col_name] = np.random.randint(0, 100, size=rows) # Simplified legacy fallback
-
-        # 5. Faker (With Safety Net)
-        for col in recipe.get('faker_columns', []):
-            col_name = self._sanitize_column_name(col['name'])
-            method = col.get('faker_method', 'word')
-
-            # Interception Logic
-            is_generic_method = method.lower() in ['word', 'words', 'sentence', 'text', 'lorem', 'string']
-            categorical_keywords = ['status', 'type', 'category', 'class', 'tier', 'mode', 'segment', 'group', 'level', 'priority', 'region', 'department']
-            name_implies_category = any(k in col_name.lower() for k in categorical_keywords)
-
-            should_intercept = (is_generic_method and name_implies_category)
-
-            if hasattr(fake, method) and not should_intercept:
-                data[col_name] = [getattr(fake, method)() for _ in range(rows)]
+                    result = await next_done
+                except Exception as e:
+                    error = {"error": str(e)}
+                    continue
+                if "error" in result:
+                    error = result
+                    continue
+                verification = result["verification"]
+                if "error" not in verification and verification.get('valid', True):
+                    return result
+                if best is None or verification.get('score', 0) > best["verification"].get('score', 0):
+                    best = result
+        finally:
+            for task in tasks:
+                task.cancel()
+        return best or error
+
+    @staticmethod
+    def history_item(definition: dict) -> str:
+        """How a project is recorded in the session's generated history (used to avoid repeats)."""
+        return f"{definition.get('title', '')} ({definition.get('recipe', {}).get('anchor_entity', {}).get('name', '')})"
+
+    def build_verified_project(self, sector: str, api_key: str, verifier, previous_context: list = None, rows: int = DEFAULT_ROWS,
+                               max_retries: int = 3, speculative_candidates: int = 0, on_stage=None) -> dict:
+        """
+        Runs the full pipeline: narrative -> recipe -> clean data -> verification, refining the
+        recipe with the verifier's issues up to `max_retries` times (or, with speculative_candidates,
+        racing that many recipes at once). `on_stage(label)` is called as each step starts.
+
+        Returns {"definition", "data", "verification"} (the last attempt, even if it never passed)
+        or {"error": ...}.
+        """
+        on_stage = on_stage or (lambda label: None)
+
+        on_stage("Drafting Scenario Narrative...")
+        narrative = self._generate_scenario_narrative(sector, api_key, previous_context)
+        if "error" in narrative:
+            return narrative
+
+        if speculative_candidates:
+            on_stage("Designing & Verifying Data Recipes...")
+            return self.run_speculative_recipe_search(narrative, api_key, verifier, candidates=speculative_candidates, rows=rows)
+
+        definition = None
+        df = None
+        verification = None
+        for current_try in range(max_retries):
+            if current_try == 0:
+                # Initial Recipe Generation
+                on_stage("Designing Data Recipe...")
+                definition = self._generate_data_recipe(narrative, api_key)
             else:
-                clean_title = col['name'].replace('_', ' ').title()
-                placeholder_opts = [f"{clean_title} {char}" for char in ['A', 'B', 'C', 'D']]
-                data[col_name] = np.random.choice(placeholder_opts, size=rows)
-
-        df = pd.DataFrame(data)
-
-        # Chaos Injection for Legacy
-        col_types = {anchor_name: 'categorical'}
-        for col in recipe.get('categorical_columns', []):
-            col_types[self._sanitize_column_name(col['name'])] = 'categorical'
-        for col in recipe.get('date_columns', []):
-            col_types[self._sanitize_column_name(col['name'])] = 'date'
-        for col in recipe.get('numeric_columns', []):
-            col_types[self._sanitize_column_name(col['name'])] = 'numeric'
-        for col in recipe.get('faker_columns', []):
-            col_types[self._sanitize_column_name(col['name'])] = 'string'
-
-        return chaos.apply_chaos(df, col_types)
-
-    def generate_dataset(self, recipe: dict, rows: int = 10000, apply_simulation_chaos: bool = True) -> pd.DataFrame:
-        data = {}
+                # Refinement based on feedback
+                on_stage(f"Refining data (Attempt {current_try+1})...")
+                definition = self.refine_data_recipe(narrative, verification['issues'], api_key)
+
+            if "error" in definition:
+                return definition
+
+            on_stage("Generating Synthetic Data...")
+            df = self.build_candidate_dataset(definition, narrative, rows)
+            if df is None:
+                return {"error": "Invalid recipe format received from AI."}
+
+            on_stage("Verifying Data Quality...")
+            verification = verifier.verify_dataset_schema(definition, df, api_key)
+            if verification.get('valid', True):
+                break # Success!
 
-        # New "Schema-First" Architecture
-        # We process the 'schema_list' which contains ALL column definitions (replacing the old split lists)
-
-        schema = recipe.get('schema_list', [])
-
-        # Support for legacy/old format during migration or if prompt fails
-        if not schema:
-            # Fallback to old generation logic if 'schema_list' is missing
-            return self._generate_dataset_legacy(recipe, rows)
-
-        # 1. Process Anchor / Independent Columns First
-        # We need to find the anchor first to handle dependencies if any
-        # But in the new schema, dependencies are simpler (dates depend on dates).
-
-        # Two-pass approach:
-        # Pass 1: Generate Independent (Categorical, ID, Text, Base Dates, Anchor)
-        # Pass 2: Generate Dependent (Dependent Dates, Numeric/Correlated)
-
-        pending_cols = []
-
-        for col in schema:
-            col_name = self._sanitize_column_name(col['name'])
-            col_type = col.get('type', 'text').lower()
-
-            # PRIORITY CHECK: If options are explicitly provided, force categorical behavior
-            # This handles cases where LLM says type="text" or "string" but provides options.
-            # EXCEPTION: If strictly defined as 'numeric', we ignore options to prevent string contamination.
-            if col.get('options') and len(col['options']) > 0 and col_type != 'numeric':
-                col_type = 'categorical'
-
-            # --- Categorical & Anchor ---
-            if col_type in ['categorical', 'anchor']:
-                options = col.get('options', [])
-                if not options:
-                    # Safety Net: No options provided for categorical?
-                    clean_title = col_name.replace('_', ' ').title()
-                    options = [f"{clean_title} A", f"{clean_title} B", f"{clean_title} C"]
-
-                weights = col.get('weights', None)
-                if weights:
-                    try:
-                        weights = [float(w) for w in weights]
-                        # Normalize
-                        total = sum(weights)
-                        if abs(total - 1.0) > 0.01:
-                            weights = [w / total for w in weights]
-                    except:
-                        weights = None
-
-                # If weights length mismatch, ignore weights
-                if weights and len(weights) != len(options):
-                    weights = None
-
-                data[col_name] = np.random.choice(options, size=rows, p=weights)
-
-            # --- ID / Text (Faker) ---
-            elif col_type in ['id', 'text']:
-                method = col.get('faker_method', 'word')
-
-                # Interception Logic (Still good to have!)
-                is_generic_method = method.lower() in ['word', 'words', 'sentence', 'text', 'lorem', 'string']
-                categorical_keywords = ['status', 'type', 'category', 'class', 'tier', 'mode', 'segment', 'group', 'level', 'priority', 'region', 'department', 'platform', 'channel']
-                name_implies_category = any(k in col_name.lower() for k in categorical_keywords)
-
-                should_intercept = (is_generic_method and name_implies_category)
-
-                if should_intercept:
-                    # Force categorical generation
-                    clean_title = col_name.replace('_', ' ').title()
-                    placeholder_opts = [f"{clean_title} {char}" for char in ['A', 'B', 'C', 'D']]
-                    data[col_name] = np.random.choice(placeholder_opts, size=rows)
-                elif hasattr(fake, method):
-                    data[col_name] = [getattr(fake, method)() for _ in range(rows)]
-                else:
-                    # Fallback Faker
-                    if 'email' in col_name.lower(): data[col_name] = [fake.email() for _ in range(rows)]
-                    elif 'name' in col_name.lower(): data[col_name] = [fake.name() for _ in range(rows)]
-                    elif 'id' in col_name.lower(): data[col_name] = [str(uuid.uuid4()) for _ in range(rows)]
-                    else: data[col_name] = [fake.word() for _ in range(rows)]
-
-            # --- Numeric (Defer to pass 2 for correlation? Or simple range?) ---
-            elif col_type == 'numeric':
-                # Simple numeric for now, can add correlation later if needed
-                # The prompt asks for min/max
-                min_val = col.get('min', 0)
-                max_val = col.get('max', 100)
-                is_float = isinstance(min_val, float) or isinstance(max_val, float)
-
-                if is_float:
-                    data[col_name] = np.random.uniform(min_val, max_val, size=rows)
-                else:
-                    data[col_name] = np.random.randint(min_val, max_val + 1, size=rows)
-
-            # --- Date (Base) ---
-            elif col_type == 'date':
-                if 'depends_on' in col:
-                    pending_cols.append(col) # Handle in Pass 2
-                else:
-                    # Base Date
-                    start_str = col.get('range_start', '2023-01-01')
-                    end_str = col.get('range_end', '2023-12-31')
-                    try:
-                        start_date = datetime.strptime(start_str, "%Y-%m-%d")
-                        end_date = datetime.strptime(end_str, "%Y-%m-%d")
-                        delta = (end_date - start_date).days
-                        random_days = np.random.randint(0, delta + 1, size=rows)
-                        base = pd.to_datetime(start_date)
-                        data[col_name] = (base + pd.to_timedelta(random_days, unit='D'))
-                    except:
-                        data[col_name] = [pd.to_datetime(fake.date_this_year()) for _ in range(rows)]
-
-        # Pass 2: Dependent Columns
-        for col in pending_cols:
-            col_name = self._sanitize_column_name(col['name'])
-            col_type = col.get('type', 'text').lower()
-
-            if col_type == 'date' and 'depends_on' in col:
-                dep_name = self._sanitize_column_name(col['depends_on'])
-                if dep_name in data:
-                    min_off = col.get('offset_days_min', 0)
-                    max_off = col.get('offset_days_max', 30)
-                    offsets = np.random.randint(min_off, max_off + 1, size=rows)
-                    base_series = pd.to_datetime(pd.Series(data[dep_name]))
-                    data[col_name] = (base_series + pd.to_timedelta(offsets, unit='D'))
-                else:
-                    # Fallback if dependency missing
-                    data[col_name] = [pd.to_datetime(fake.date_this_year()) for _ in range(rows)]
-
-        df = pd.DataFrame(data)
+        return {"definition": definition, "data": df, "verification": verification}
+
+    def run_speculative_recipe_search(self, narrative: dict, api_key: str, verifier, candidates: int = 3, rows: int = DEFAULT_ROWS) -> dict:
+        """Blocking entry point for speculative_recipe_search (for the Streamlit script thread)."""
+        return asyncio.run(self.speculative_recipe_search(narrative, api_key, verifier, candidates, rows))
+
+    # Legacy wrapper for compatibility if needed
+    def generate_project_definition(self, sector: str, api_key: str = None, previous_context: list = None):
+        return self.orchestrate_project_generation(sector, api_key, previous_context)
+
+    def generate_dataset(self, recipe: dict, rows: int = DEFAULT_ROWS, apply_simulation_chaos: bool = True, seed: int = None, workers: int = 1, use_cache: bool = True) -> pd.DataFrame:
+        """
+        Generates the dataset for a recipe.
+
+        Rows are produced in chunks of DEFAULT_CHUNK_SIZE, each with its own random stream spawned
+        from `seed`, so the same (recipe, seed, rows) yields identical data whether the chunks are
+        generated sequentially, streamed, or spread over `workers` processes.
+        Seeded datasets are also deterministic, so their clean version is served from the on-disk cache.
+        """
+        df = None
+        cache_key = None
+        if use_cache and seed is not None:
+            cache_key = dataset_cache.make_key(recipe, seed, rows)
+            df = dataset_cache.get(cache_key)
+
+        if df is None:
+            if workers > 1 and rows > DEFAULT_CHUNK_SIZE:
+                df = self._generate_dataset_parallel(recipe, rows, seed, workers)
+            else:
+                chunks = list(self.iter_dataset_chunks(recipe, rows, seed=seed))
+                df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+            if cache_key:
+                dataset_cache.put(cache_key, df)
 
         # 6. Inject Chaos (Optional)
         if apply_simulation_chaos:
@@ -569,26 +481,156 @@ class ProjectGenerator:
 
         return df
 
-    def apply_chaos_to_data(self, df: pd.DataFrame, recipe: dict) -> pd.DataFrame:
+    def recipe_seed(self, recipe: dict) -> int:
+        """Derives a stable seed from the recipe, so the same recipe always maps to the same cached dataset."""
+        return int(recipe_fingerprint(recipe)[:8], 16)
+
+    def _generate_dataset_parallel(self, recipe: dict, rows: int, seed: int, workers: int) -> pd.DataFrame:
+        sizes, seeds = self._chunk_plan(rows, DEFAULT_CHUNK_SIZE, seed)
+        executor = _get_executor(workers)
+        chunks = list(executor.map(_generate_chunk, itertools.repeat(recipe), sizes, seeds))
+        return pd.concat(chunks, ignore_index=True)
+
+    def _chunk_plan(self, rows: int, chunk_size: int, seed: int):
+        """Splits `rows` into chunk sizes and gives each chunk an independent child seed."""
+        sizes = [min(chunk_size, rows - start) for start in range(0, rows, chunk_size)] or [0]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        return sizes, seeds
+
+    def _generate_frame(self, recipe: dict, rows: int, rng: np.random.Generator) -> pd.DataFrame:
+        """Generates one clean (pre-chaos) block of `rows` rows from a single random stream."""
+        plan = compile_recipe(recipe)
+
+        # Columns come out of the plan in dependency order, so a dependent date
+        # always finds its base column already generated.
+        data = {}
+        for spec in plan.columns:
+            data[spec.name] = self._generate_column(spec, rows, rng, data)
+
+        return pd.DataFrame({name: data[name] for name in plan.output_order})
+
+    def _generate_column(self, spec: ColumnSpec, rows: int, rng: np.random.Generator, data: dict):
+        # --- Categorical & Anchor ---
+        if spec.kind == 'categorical':
+            return categorical_column(list(spec.options), rows, rng, spec.weights)
+
+        # --- ID / Text (Faker) ---
+        if spec.kind == 'faker':
+            return faker_pool.sample(spec.faker_method, rows, rng)
+
+        # --- Correlated (per-anchor rules, one vectorized lookup by category code) ---
+        if spec.conditional:
+            codes = np.asarray(data[spec.depends_on].codes)
+            if spec.kind == 'boolean':
+                return rng.random(rows) < np.take(np.array(spec.rule_prob, dtype=float), codes)
+            low = np.take(np.array(spec.rule_low), codes)
+            high = np.take(np.array(spec.rule_high), codes)
+            if spec.is_float:
+                return rng.uniform(low.astype(float), high.astype(float))
+            dtype = safe_int_dtype(min(spec.rule_low), max(spec.rule_high))
+            return rng.integers(low.astype(np.int64), high.astype(np.int64) + 1, size=rows).astype(dtype)
+
+        # --- Numeric ---
+        if spec.kind == 'numeric':
+            if spec.is_float:
+                return rng.uniform(spec.low, spec.high, size=rows)
+            return rng.integers(spec.low, spec.high + 1, size=rows, dtype=safe_int_dtype(spec.low, spec.high))
+
+        # --- Boolean ---
+        if spec.kind == 'boolean':
+            return rng.random(rows) < spec.probability
+
+        # --- Date (Dependent) ---
+        if spec.depends_on:
+            offsets = rng.integers(spec.offset_min, spec.offset_max + 1, size=rows)
+            dates = pd.to_datetime(pd.Series(data[spec.depends_on])) + pd.to_timedelta(offsets, unit='D')
+            return dates.dt.date.values if spec.date_objects else dates.values
+
+        # --- Date (Base) ---
+        try:
+            start_date = datetime.strptime(spec.range_start, "%Y-%m-%d")
+            end_date = datetime.strptime(spec.range_end, "%Y-%m-%d")
+            delta = (end_date - start_date).days
+            random_days = rng.integers(0, delta + 1, size=rows)
+            dates = pd.to_datetime(start_date) + pd.to_timedelta(random_days, unit='D')
+        except (TypeError, ValueError):
+            # No usable range (or a dependency that had to be dropped)
+            dates = pd.to_datetime(faker_pool.sample('date_this_year', rows, rng))
+        return dates.date if spec.date_objects else dates
+
+    def plan_chaos(self, df: pd.DataFrame, recipe: dict, seed: int = None) -> ChaosOverlay:
+        """
+        Picks the chaos attacks for a clean dataframe and returns them as a sparse overlay,
+        leaving `df` untouched. A seed makes the injected issues reproducible.
+        """
+        return chaos.plan_chaos(df, compile_recipe(recipe).col_types, np.random.default_rng(seed))
+
+    def apply_chaos_to_data(self, df: pd.DataFrame, recipe: dict, seed: int = None) -> pd.DataFrame:
         """
         Applies chaos simulation to an existing dataframe based on the recipe schema.
-        Useful for applying chaos AFTER verification.
+        Useful for applying chaos AFTER verification. A seed makes the injected issues reproducible.
         """
-        col_types = {}
-        schema = recipe.get('schema_list', [])
-
-        # New Schema Logic
-        if schema:
-            for col in schema:
-                clean_name = self._sanitize_column_name(col['name'])
-                c_type = col.get('type', 'text')
-                if c_type == 'anchor': col_types[clean_name] = 'categorical'
-                elif c_type == 'id': col_types[clean_name] = 'string'
-                else: col_types[clean_name] = c_type
-        else:
-            # Legacy Logic (Simplified reconstruction if needed)
-            pass
+        return self.plan_chaos(df, recipe, seed).materialize(df)
 
-        return chaos.apply_chaos(df, col_types)
+    def iter_dataset_chunks(self, recipe: dict, rows: int, chunk_size: int = DEFAULT_CHUNK_SIZE, seed: int = None):
+        """
+        Yields the clean (pre-chaos) dataset as consecutive DataFrames of at most `chunk_size` rows.
+        Every chunk is generated independently (dependent dates included), so peak memory
+        is bounded by the chunk size rather than the total row count.
+        """
+        start = 0
+        for n_rows, chunk_seed in zip(*self._chunk_plan(rows, chunk_size, seed)):
+            chunk = self._generate_frame(recipe, n_rows, np.random.default_rng(chunk_seed))
+            chunk.index = pd.RangeIndex(start, start + n_rows)
+            start += n_rows
+            yield chunk
+
+    def write_dataset_parquet(self, recipe: dict, path: str, rows: int, chunk_size: int = DEFAULT_CHUNK_SIZE, compression: str = 'zstd', seed: int = None) -> str:
+        """
+        Streams a clean dataset of `rows` rows into a Parquet file, one row group per chunk.
+        Used for "big data" projects (millions of rows) that should never be held in memory at once.
+        With rows=0 the file holds the schema and no rows.
+        """
+        if rows < 0:
+            raise ValueError(f"rows must be >= 0, got {rows}")
+        if rows == 0:
+            # An empty chunk can't type its text columns; take the schema from a one-row sample
+            sample = self._generate_frame(recipe, 1, np.random.default_rng(seed))
+            arrow_schema = pa.Table.from_pandas(sample, preserve_index=False).schema
+            pq.write_table(arrow_schema.empty_table(), path, compression=compression)
+            return path
+
+        writer = None
+        arrow_schema = None
+        try:
+            for chunk in self.iter_dataset_chunks(recipe, rows, chunk_size, seed):
+                # The first chunk fixes the schema, so later chunks can't drift (e.g. an all-null column)
+                table = pa.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False)
+                if writer is None:
+                    arrow_schema = table.schema
+                    writer = pq.ParquetWriter(path, arrow_schema, compression=compression)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return path
 
 project_generator = ProjectGenerator()
+
+# --- Process Pool (Parallel Generation) ---
+# Workers are spawned (not forked) because Streamlit runs sessions on threads,
+# and kept alive between calls so interpreter start-up is paid once. There is one pool per
+# worker count: a pool is never shut down while another session may have chunks queued on it.
+_executors = {}
+_executor_lock = threading.Lock()
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    with _executor_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executors[workers] = executor
+        return executor
+
+def _generate_chunk(recipe: dict, rows: int, seed: np.random.SeedSequence) -> pd.DataFrame:
+    return project_generator._generate_frame(recipe, rows, np.random.default_rng(seed))
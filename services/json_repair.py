@@ -0,0 +1,204 @@
+import json
+from dataclasses import dataclass
+
+# How many earlier cut points to try when closing a truncated response
+MAX_REPAIR_CUTS = 64
+# How many opening brackets to try as the start of the JSON (prose before it may contain brackets)
+MAX_JSON_STARTS = 16
+
+
+@dataclass(slots=True)
+class JSONExtraction:
+    """A JSON value pulled out of an LLM response; `repaired` if it needed more than fence stripping."""
+    value: object
+    repaired: bool = False
+    truncated: bool = False
+
+
+@dataclass(frozen=True)
+class StageSchema:
+    """
+    Top-level shape a stage's JSON must have: `required` maps keys to accepted types, and at
+    least one key of `one_of` (if given) must be present.
+    """
+    required: dict
+    one_of: tuple = ()
+    one_of_types: tuple = ()
+
+    def missing(self, value) -> list:
+        """Keys that are absent or have the wrong type (for one_of, the preferred key)."""
+        if not isinstance(value, dict):
+            return list(self.required) + list(self.one_of[:1])
+        missing = [k for k, t in self.required.items() if not isinstance(value.get(k), t)]
+        if self.one_of and not any(isinstance(value.get(k), t) for k, t in zip(self.one_of, self.one_of_types)):
+            missing.append(self.one_of[0])
+        return missing
+
+
+# Only what the next step can't do without: a recipe body to generate data from, and a verdict
+# with its issues (fed to the refine prompt). Everything else is optional and defaulted by its reader.
+STAGE_SCHEMAS = {
+    "recipe": StageSchema({}, ("schema_list", "recipe"), (list, dict)),
+    "refine": StageSchema({}, ("schema_list", "recipe"), (list, dict)),
+    "verify": StageSchema({"valid": bool, "issues": list}),
+}
+
+
+def _scan(text: str, start: int):
+    """
+    Copies the JSON value starting at `start`, dropping comments and trailing commas and escaping
+    raw newlines inside strings. Stops at the matching closing bracket, so trailing prose is ignored.
+
+    Returns (cleaned text, complete, cut points, open brackets). A cut point is (length of
+    cleaned text, open brackets there): a position where the text can be cut and closed without
+    keeping a partial value - after an opening bracket, a nested closing bracket or a string
+    value, or just before a comma.
+    """
+    out = []
+    stack = []
+    cuts = []
+    in_string = False
+    value_string = False
+    escaped = False
+    previous = ''  # last significant character outside strings
+    i = start
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_string = False
+            elif c == '\n':
+                c = '\\n'
+            out.append(c)
+            if not in_string and value_string:
+                cuts.append((len(out), tuple(stack)))
+            i += 1
+            continue
+
+        if c == '"':
+            in_string = True
+            # Keys may not be kept without their value; array items and object values can
+            value_string = previous == ':' or (bool(stack) and stack[-1] == ']' and previous in '[,')
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        elif c in '{[':
+            stack.append('}' if c == '{' else ']')
+            out.append(c)
+            cuts.append((len(out), tuple(stack)))
+            previous = c
+            i += 1
+            continue
+        elif c in '}]':
+            # Trailing comma before the closing bracket
+            k = len(out) - 1
+            while k >= 0 and out[k].isspace():
+                k -= 1
+            if k >= 0 and out[k] == ',':
+                del out[k]
+            if not stack or stack[-1] != c:
+                raise json.JSONDecodeError("Mismatched bracket", text, i)
+            stack.pop()
+            out.append(c)
+            if not stack:
+                return "".join(out), True, cuts, stack
+            cuts.append((len(out), tuple(stack)))
+            previous = c
+            i += 1
+            continue
+        elif c == ',':
+            cuts.append((len(out), tuple(stack)))
+        out.append(c)
+        if not c.isspace():
+            previous = c
+        i += 1
+    return "".join(out), False, cuts, stack
+
+
+def _close(text: str, stack) -> str:
+    return text + "".join(reversed(stack))
+
+
+def _repair_truncated(cleaned: str, cuts: list):
+    """Closes a truncated value at the latest cut point that parses, or returns None."""
+    # Cuts inside a nested object are skipped, so a half-written item (e.g. a column missing
+    # its type) is dropped, not kept.
+    safe_cuts = [(pos, open_stack) for pos, open_stack in cuts if '}' not in open_stack[1:]]
+    for pos, open_stack in reversed(safe_cuts[-MAX_REPAIR_CUTS:]):
+        try:
+            return json.loads(_close(cleaned[:pos], open_stack))
+        except ValueError:
+            continue
+    return None
+
+
+def extract_json(text: str) -> JSONExtraction:
+    """
+    Finds the outermost JSON object (or array) in an LLM response and parses it, tolerating
+    Markdown fences, surrounding prose (brackets in it included), // and /* */ comments, trailing
+    commas and a truncated tail. A truncated value is cut back to the last complete value and
+    closed (a cut-off string or number is dropped rather than kept half-written) and flagged
+    `truncated`, since whatever came after the cut is missing. Raises json.JSONDecodeError if
+    nothing usable is found.
+    """
+    stripped = text.strip()
+    try:
+        return JSONExtraction(json.loads(stripped.replace('```json', '').replace('```', '').strip()))
+    except ValueError:
+        pass
+
+    starts = [i for i, c in enumerate(stripped) if c in '{['][:MAX_JSON_STARTS]
+    if not starts:
+        raise json.JSONDecodeError("No JSON object found in response", text, 0)
+
+    # Brackets are tried in order, so a value nested in one that failed to parse (e.g. prose
+    # like "{the}" before the real object) is still found
+    for start in starts:
+        try:
+            cleaned, complete, cuts, stack = _scan(stripped, start)
+        except json.JSONDecodeError:
+            continue
+        if complete:
+            try:
+                return JSONExtraction(json.loads(cleaned), repaired=True)
+            except ValueError:
+                continue
+        value = _repair_truncated(cleaned, cuts)
+        if value is not None:
+            return JSONExtraction(value, repaired=True, truncated=True)
+    raise json.JSONDecodeError("No complete or repairable JSON found in response", text, len(text))
+
+
+def completion_prompt(original_prompt: str, partial: dict, missing: list, truncated: bool = False) -> str:
+    """
+    Follow-up prompt asking only for the fields a (repaired) response lacks. For a truncated
+    response, the last key in `missing` is the one that was cut off and is asked for in full,
+    along with any keys that should have followed it.
+    """
+    if truncated:
+        request = (f"Output ONLY a JSON object with the keys {json.dumps(missing)} in full (the last one was cut off), "
+                   f"plus any other keys of the requested format that are not in the part above.")
+        intro = "Your answer was cut off. This is the part that arrived (the last field is incomplete):"
+    else:
+        request = f"Output ONLY a JSON object with the missing keys {json.dumps(missing)}, consistent with the part above."
+        intro = "Your answer was incomplete. This is the part that arrived:"
+    return f"""
+        You were given the following request:
+        ---
+        {original_prompt}
+        ---
+        {intro}
+        {json.dumps(partial, indent=2)}
+
+        {request}
+        """
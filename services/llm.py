@@ -1,49 +1,244 @@
 
 import os
-import json
+import time
 import google.generativeai as genai
 from dotenv import load_dotenv
+from .llm_cache import llm_cache
+from .llm_clients import model_pool
+from .llm_retry import call_with_retry, acall_with_retry, RetryPolicy
+from .llm_throttle import llm_flights, llm_rate_limiter
+from .llm_metrics import llm_metrics
+from .llm_replay import llm_backend
+from .json_repair import extract_json, completion_prompt, STAGE_SCHEMAS
+from .prompt_builder import prompt_builder
 
 load_dotenv()
 
+# Using gemma-3-27b-it as explicitly requested
+MODEL_NAME = 'gemma-3-27b-it'
+
+# Share of its deadline a caller spends waiting on an identical in-flight request before
+# sending its own; the rest is left for that call
+FOLLOWER_WAIT_SHARE = 0.5
+
 class LLMService:
     def __init__(self):
-        pass
+        self.cache = llm_cache
+        self.clients = model_pool
+        self.prompt_builder = prompt_builder
+        self.flights = llm_flights
+        self.rate_limiter = llm_rate_limiter
+        self.metrics = llm_metrics
+        self.backend = llm_backend
 
-    def _get_model(self, api_key: str):
-        genai.configure(api_key=api_key)
-        # Using gemma-3-27b-it as explicitly requested
-        return genai.GenerativeModel('gemma-3-27b-it')
+    def _get_model(self, api_key: str, stage: str = None):
+        if self.backend is not None:
+            # Record/replay (LLM_BACKEND): fixtures are kept per stage
+            return self.backend.model(stage, lambda: self.clients.get_model(api_key, MODEL_NAME))
+        # Pooled per key, so concurrent sessions never touch the SDK's global configuration
+        return self.clients.get_model(api_key, MODEL_NAME)
+
+    def _api_key(self, api_key: str = None):
+        """The key to call with; replay needs none, so it gets a placeholder instead of the mock fallback."""
+        key = api_key or os.getenv("GEMINI_API_KEY")
+        if not key and self.backend is not None and self.backend.offline:
+            return "replay"
+        return key
 
     def list_available_models(self, api_key: str):
         try:
-            genai.configure(api_key=api_key)
-            return [m.name for m in genai.list_models()]
+            return [m.name for m in self.clients.get_client(api_key, "model").list_models()]
         except Exception as e:
             return [f"Error listing models: {str(e)}"]
 
-    def generate_json(self, prompt: str, api_key: str = None, temperature: float = 0.9) -> dict:
-        key_to_use = api_key or os.getenv("GEMINI_API_KEY")
+    def _request_options(self, timeout: float) -> dict:
+        # The SDK otherwise waits up to 600s and retries on its own; retries are handled by call_with_retry
+        return {"timeout": timeout, "retry": None}
+
+    def _json_request(self, api_key: str, full_prompt: str, temperature: float, stage: str = None):
+        """Returns a blocking request(timeout) -> response text, for call_with_retry / acall_with_retry."""
+        model = self._get_model(api_key, stage)
+        # Set high temperature for creativity
+        generation_config = genai.types.GenerationConfig(
+            temperature=temperature
+        )
+
+        def request(timeout: float) -> str:
+            response = model.generate_content(full_prompt, generation_config=generation_config, request_options=self._request_options(timeout))
+            return response.text
+        return request
+
+    def _text_request(self, api_key: str, full_prompt: str, stage: str = None):
+        model = self._get_model(api_key, stage)
+
+        def request(timeout: float) -> str:
+            return model.generate_content(full_prompt, request_options=self._request_options(timeout)).text
+        return request
+
+    def _cacheable(self, use_cache: bool) -> bool:
+        """Recording never reads the cache (every stage must reach the recorder)."""
+        return use_cache and (self.backend is None or self.backend.offline)
+
+    def _cache_key(self, kind: str, prompt: str, params: dict = None) -> str:
+        """Replayed responses are cached apart from live ones, so fixture data never answers a live call."""
+        params = dict(params or {})
+        if self.backend is not None:
+            params["backend"] = self.backend.mode
+        return self.cache.make_key(MODEL_NAME, kind, prompt, params)
+
+    def _call(self, request, api_key: str, timeout: float = None, flight_key: str = None) -> str:
+        """
+        Runs a request under the per-key rate limit. With `flight_key` (the cache key of a
+        cacheable request), identical requests already in flight from other sessions are joined
+        instead of sent again. Only response text is shared, so callers never share mutable results.
+        A joined request is only waited on for part of the caller's own deadline.
+        """
+        timeout = timeout or RetryPolicy().timeout
+        deadline = time.monotonic() + timeout
+
+        def run():
+            return call_with_retry(request, timeout=self._remaining(deadline), rate_limit=self.rate_limiter.bucket(api_key))
+        return self.flights.do(flight_key, run, timeout * FOLLOWER_WAIT_SHARE) if flight_key else run()
+
+    async def _acall(self, request, api_key: str, timeout: float = None, flight_key: str = None) -> str:
+        timeout = timeout or RetryPolicy().timeout
+        deadline = time.monotonic() + timeout
+
+        def run():
+            return acall_with_retry(request, timeout=self._remaining(deadline), rate_limit=self.rate_limiter.bucket(api_key))
+        return await (self.flights.ado(flight_key, run, timeout * FOLLOWER_WAIT_SHARE) if flight_key else run())
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM request deadline exceeded")
+        return remaining
+
+    def metrics_summary(self) -> dict:
+        """Rolling p50/p95 latency, token and failure counts per pipeline stage (see llm_metrics)."""
+        return self.metrics.summary()
+
+    def throttle_stats(self) -> dict:
+        """Coalescing and rate-limit queue metrics (per hashed API key)."""
+        return {"coalesced": self.flights.coalesced, "in_flight": self.flights.in_flight(), "keys": self.rate_limiter.stats()}
+
+    def _parse_json(self, text: str, stage: str = None, trace=None):
+        """
+        Extracts the JSON from a response (see json_repair.extract_json) and returns
+        (value, keys to ask for, cut-off key). The keys to ask for are the stage schema's missing
+        keys plus, for a truncated response, the top-level key that was being written when it
+        was cut off (its repaired value is incomplete).
+        """
+        extraction = extract_json(text)
+        if trace is not None:
+            trace.repaired = extraction.repaired
+        value = extraction.value
+        schema = STAGE_SCHEMAS.get(stage)
+        missing = schema.missing(value) if schema else []
+        cut_key = None
+        if extraction.truncated:
+            if not isinstance(value, dict) or not value:
+                raise ValueError("JSON response was cut off before its first complete field")
+            cut_key = next(reversed(value))
+            if cut_key not in missing:
+                missing.append(cut_key)
+        return value, missing, cut_key
+
+    def _merge_completion(self, result, missing: list, extra: dict, stage: str, cut_key: str = None) -> dict:
+        if "error" in extra:
+            raise ValueError(f"Incomplete JSON response, follow-up failed: {extra['error']}")
+        result = result if isinstance(result, dict) else {}
+        result.update({k: extra[k] for k in missing if k in extra})
+        if cut_key is not None:
+            # Keys after the cut never arrived; take any the follow-up supplied
+            result.update({k: v for k, v in extra.items() if k not in result})
+        schema = STAGE_SCHEMAS.get(stage)
+        still_missing = schema.missing(result) if schema else []
+        if cut_key is not None and cut_key not in extra:
+            still_missing.append(cut_key)
+        if still_missing:
+            raise ValueError(f"JSON response is missing required keys: {', '.join(still_missing)}")
+        return result
+
+    def generate_json(self, prompt: str, api_key: str = None, temperature: float = 0.9, use_cache: bool = True, timeout: float = None, stage: str = "json", cache_if=None) -> dict:
+        """
+        Generates a JSON object from the LLM.
+        Successful responses are cached by prompt and temperature; pass use_cache=False for
+        creative prompts where a repeated call should produce something new.
+        `timeout` bounds the whole call in seconds, retries included (default: RetryPolicy.timeout).
+        `stage` tags the call in llm_metrics (e.g. "narrative", "recipe", "verify").
+        `cache_if(result)`, if given, decides whether a result is worth caching (e.g. only passing verdicts).
+        """
+        key_to_use = self._api_key(api_key)
+        use_cache = self._cacheable(use_cache)
         if not key_to_use:
             return self._mock_response(prompt)
 
+        trace = self.metrics.trace(stage, "json")
         try:
-            model = self._get_model(key_to_use)
             full_prompt = f"{prompt}\n\nRespond strictly with valid JSON."
-            # Set high temperature for creativity
-            generation_config = genai.types.GenerationConfig(
-                temperature=temperature
-            )
-            response = model.generate_content(full_prompt, generation_config=generation_config)
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            return json.loads(text)
+            trace.prompt = full_prompt
+            cache_key = self._cache_key("json", full_prompt, {"temperature": temperature})
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    trace.cache_hit = True
+                    return cached
+
+            text = self._call(trace.counted(self._json_request(key_to_use, full_prompt, temperature, stage)), key_to_use, timeout, cache_key if use_cache else None)
+            trace.response = text
+            result, missing, cut_key = self._parse_json(text, stage, trace)
+            if missing:
+                # Only ask for what is missing instead of repeating the whole request
+                extra = self.generate_json(completion_prompt(full_prompt, result, missing, truncated=cut_key is not None), key_to_use, temperature, use_cache=False, timeout=timeout, stage=f"{stage}_completion")
+                result = self._merge_completion(result, missing, extra, stage, cut_key)
+            if use_cache and (cache_if is None or cache_if(result)):
+                self.cache.put(cache_key, result, MODEL_NAME, "json")
+            return result
         except Exception as e:
+            trace.error = e
             # If an API key was provided, we want to see the REAL error, not the mock.
             if key_to_use:
                 return {"error": f"API Error: {str(e)}"}
             return self._mock_response(prompt)
+        finally:
+            trace.finish()
 
-    def generate_text(self, prompt: str, api_key: str = None, project_context: dict = None, code_context: dict = None, history: list = None) -> str:
+    async def agenerate_json(self, prompt: str, api_key: str = None, temperature: float = 0.9, use_cache: bool = True, timeout: float = None, stage: str = "json", cache_if=None) -> dict:
+        """Async version of generate_json, with the same caching, deadline and error contract."""
+        key_to_use = self._api_key(api_key)
+        use_cache = self._cacheable(use_cache)
+        if not key_to_use:
+            return self._mock_response(prompt)
+
+        trace = self.metrics.trace(stage, "json")
+        try:
+            full_prompt = f"{prompt}\n\nRespond strictly with valid JSON."
+            trace.prompt = full_prompt
+            cache_key = self._cache_key("json", full_prompt, {"temperature": temperature})
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    trace.cache_hit = True
+                    return cached
+
+            text = await self._acall(trace.counted(self._json_request(key_to_use, full_prompt, temperature, stage)), key_to_use, timeout, cache_key if use_cache else None)
+            trace.response = text
+            result, missing, cut_key = self._parse_json(text, stage, trace)
+            if missing:
+                extra = await self.agenerate_json(completion_prompt(full_prompt, result, missing, truncated=cut_key is not None), key_to_use, temperature, use_cache=False, timeout=timeout, stage=f"{stage}_completion")
+                result = self._merge_completion(result, missing, extra, stage, cut_key)
+            if use_cache and (cache_if is None or cache_if(result)):
+                self.cache.put(cache_key, result, MODEL_NAME, "json")
+            return result
+        except Exception as e:
+            trace.error = e
+            return {"error": f"API Error: {str(e)}"}
+        finally:
+            trace.finish()
+
+    def generate_text(self, prompt: str, api_key: str = None, project_context: dict = None, code_context: dict = None, history: list = None, use_cache: bool = True, timeout: float = None, stage: str = "mentor") -> str:
         """
         Generates text response from the LLM.
 
@@ -53,98 +248,129 @@ class LLMService:
             project_context (dict): The project definition (title, description, tasks, schema).
             code_context (dict): The current state of the python/sql editors.
             history (list): List of message dictionaries [{'role': 'user'|'assistant', 'content': '...'}] from the session state.
+            use_cache (bool): Reuse a cached answer to the exact same prompt and context.
+            timeout (float): Deadline for the whole call in seconds, retries included.
+            stage (str): Tag for the call in llm_metrics.
         """
-        key_to_use = api_key or os.getenv("GEMINI_API_KEY")
+        key_to_use = self._api_key(api_key)
+        use_cache = self._cacheable(use_cache)
         if not key_to_use:
             return "This is a mock response from the Senior Agent. Please set GEMINI_API_KEY to get real responses."
 
+        trace = self.metrics.trace(stage, "text")
         try:
-            model = self._get_model(key_to_use)
-
-            # Construct project context string
-            project_str = ""
-            if project_context:
-                project_str = "\n\n--- Project Context ---\n"
-                project_str += f"Title: {project_context.get('title', 'N/A')}\n"
-                project_str += f"Scenario: {project_context.get('description', 'N/A')}\n"
-                if 'tasks' in project_context:
-                    project_str += "Tasks:\n"
-                    for i, task in enumerate(project_context['tasks']):
-                        project_str += f"{i+1}. {task}\n"
-
-                schema = project_context.get('display_schema') or project_context.get('schema')
-                if schema:
-                     project_str += "Schema:\n"
-                     for col in schema:
-                         project_str += f"- {col.get('name')} ({col.get('type')})\n"
-
-                project_str += "-----------------------\n"
-
-            # Construct context string from code
-            code_str = ""
-            if code_context:
-                code_str = "\n\n--- User's Current Notebook ---\n"
-
-                # Handle Notebook List Format
-                if code_context.get("notebook"):
-                    for idx, cell in enumerate(code_context["notebook"]):
-                        c_type = cell.get('cell_type', 'unknown').upper()
-                        content = cell.get('source', '').strip()
-                        output = str(cell.get('output', '')).strip()
-
-                        code_str += f"Cell {idx+1} [{c_type}]:\n{content}\n"
-                        if output:
-                            # Truncate output if it's too long to avoid token limits
-                            if len(output) > 500:
-                                output = output[:500] + "...(truncated)"
-                            code_str += f"Output:\n{output}\n"
-                        code_str += "\n"
-
-                # Fallback for legacy keys (if any)
-                if code_context.get("python"):
-                    code_str += f"Python IDE:\n{code_context['python']}\n\n"
-                if code_context.get("sql"):
-                    code_str += f"SQL IDE:\n{code_context['sql']}\n"
-
-                code_str += "---------------------------\n"
-
-            # Construct conversation history string
-            history_str = ""
-            if history:
-                history_str = "\n\n--- Conversation History ---\n"
-                # Limit history to last 10 messages to prevent token overflow
-                recent_history = history[-10:]
-                for msg in recent_history:
-                    role = "User" if msg['role'] == 'user' else "Mentor"
-                    content = msg['content']
-                    history_str += f"{role}: {content}\n"
-                history_str += "----------------------------\n"
-
-            # Add system instruction to prompt for Socratic guidance with code awareness
-            system_instruction = """
-            You are a Senior Data Analyst mentor guiding a Junior Analyst.
-            You have access to the code they are currently writing in the IDE (if any) and the recent conversation history.
-
-            Guidelines:
-            1. If the user asks a direct question like "Will this code work?" or "What is wrong?", analyze the provided code context.
-               - If there is a syntax error or logical flaw, point it out specifically.
-               - If it looks correct, confirm it.
-            2. If the user is asking for the solution from scratch (e.g., "How do I do X?"), DO NOT provide the full code immediately.
-               - Instead, guide them: "Have you tried using groupby?" or "Look into the matplotlib plot function."
-               - Ask leading questions to help them derive the answer.
-            3. Balance being helpful (unblocking them) with being educational (making them think).
-               - If they are clearly stuck after trying, you can provide a small snippet or corrected syntax, but avoid writing the whole script if possible.
-            4. Be encouraging and constructive.
-            """
-
-            full_prompt = f"{system_instruction}\n{project_str}\n{code_str}\n{history_str}\nUser Question: {prompt}"
-
-            response = model.generate_content(full_prompt)
-            return response.text
+            full_prompt = self._build_chat_prompt(prompt, project_context, code_context, history)
+            trace.prompt = full_prompt
+
+            cache_key = self._cache_key("text", full_prompt)
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    trace.cache_hit = True
+                    trace.response = cached
+                    return cached
+
+            text = self._call(trace.counted(self._text_request(key_to_use, full_prompt, stage)), key_to_use, timeout, cache_key if use_cache else None)
+            trace.response = text
+            if use_cache:
+                self.cache.put(cache_key, text, MODEL_NAME, "text")
+            return text
         except Exception as e:
+            trace.error = e
             if key_to_use:
                 return f"Error connecting to AI Mentor: {str(e)}"
             return "I'm having trouble connecting to my brain right now. Please try again later."
+        finally:
+            trace.finish()
+
+    async def agenerate_text(self, prompt: str, api_key: str = None, project_context: dict = None, code_context: dict = None, history: list = None, use_cache: bool = True, timeout: float = None, stage: str = "mentor") -> str:
+        """Async version of generate_text."""
+        key_to_use = self._api_key(api_key)
+        use_cache = self._cacheable(use_cache)
+        if not key_to_use:
+            return "This is a mock response from the Senior Agent. Please set GEMINI_API_KEY to get real responses."
+
+        trace = self.metrics.trace(stage, "text")
+        try:
+            full_prompt = self._build_chat_prompt(prompt, project_context, code_context, history)
+            trace.prompt = full_prompt
+
+            cache_key = self._cache_key("text", full_prompt)
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    trace.cache_hit = True
+                    trace.response = cached
+                    return cached
+
+            text = await self._acall(trace.counted(self._text_request(key_to_use, full_prompt, stage)), key_to_use, timeout, cache_key if use_cache else None)
+            trace.response = text
+            if use_cache:
+                self.cache.put(cache_key, text, MODEL_NAME, "text")
+            return text
+        except Exception as e:
+            trace.error = e
+            return f"Error connecting to AI Mentor: {str(e)}"
+        finally:
+            trace.finish()
+
+    def generate_text_stream(self, prompt: str, api_key: str = None, project_context: dict = None, code_context: dict = None, history: list = None, use_cache: bool = True, timeout: float = None, stage: str = "mentor"):
+        """
+        Streaming variant of generate_text: yields the response in chunks as they arrive.
+        The complete text is cached once the stream finishes, so a cached answer comes back as a single chunk.
+        Retries only cover opening the stream (up to the first chunk); `timeout` is the deadline for the whole stream.
+        """
+        key_to_use = self._api_key(api_key)
+        use_cache = self._cacheable(use_cache)
+        if not key_to_use:
+            yield "This is a mock response from the Senior Agent. Please set GEMINI_API_KEY to get real responses."
+            return
+
+        trace = self.metrics.trace(stage, "stream")
+        try:
+            full_prompt = self._build_chat_prompt(prompt, project_context, code_context, history)
+            trace.prompt = full_prompt
+
+            cache_key = self._cache_key("text", full_prompt)
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    trace.cache_hit = True
+                    trace.response = cached
+                    yield cached
+                    return
+
+            model = self._get_model(key_to_use, stage)
+            stream = call_with_retry(
+                trace.counted(lambda t: model.generate_content(full_prompt, stream=True, request_options=self._request_options(t))),
+                timeout=timeout,
+                rate_limit=self.rate_limiter.bucket(key_to_use),
+            )
+            parts = []
+            for chunk in stream:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only a finish reason)
+                    continue
+                parts.append(text)
+                yield text
+            trace.response = "".join(parts)
+            if use_cache and parts:
+                self.cache.put(cache_key, "".join(parts), MODEL_NAME, "text")
+        except Exception as e:
+            trace.error = e
+            if key_to_use:
+                yield f"Error connecting to AI Mentor: {str(e)}"
+            else:
+                yield "I'm having trouble connecting to my brain right now. Please try again later."
+        finally:
+            # Also runs when the consumer stops early; latency covers the whole stream
+            trace.finish()
+
+    def _build_chat_prompt(self, prompt: str, project_context: dict = None, code_context: dict = None, history: list = None) -> str:
+        """Assembles the mentor prompt (system instruction, project, notebook, history, question) within the token budget."""
+        return self.prompt_builder.build(prompt, project_context, code_context, history)
 
     def _mock_response(self, prompt: str) -> dict:
         return {
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM responses, keyed by model, prompt and generation parameters.
+
+    Entries expire after ttl_seconds. Once the stored responses grow past max_bytes, the
+    least-recently-used ones are evicted first. The database is shared by every session
+    (and process) using the same cache_dir; hit/miss counters are per process.
+    """
+
+    def __init__(self, cache_dir: str = None, ttl_seconds: int = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or os.getenv("LLM_CACHE_DIR", os.path.join(".cache", "llm"))
+        self.ttl_seconds = ttl_seconds or int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.max_bytes = max_bytes or int(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+        self.enabled = os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+        self._lock = threading.Lock()
+        self._conn = None
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily (and once) so importing the service never touches the disk
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.cache_dir, "responses.sqlite3"), check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def make_key(self, model: str, kind: str, prompt: str, params: dict = None) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        payload = json.dumps({"model": model, "kind": kind, "prompt": prompt_hash, "params": params or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached value (JSON-decoded) or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._counters["misses"] += 1
+                    return None
+                value, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                    self._counters["expired"] += 1
+                    self._counters["misses"] += 1
+                    return None
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self._counters["hits"] += 1
+                return json.loads(value)
+            except (sqlite3.Error, ValueError) as e:
+                print(f"Error reading LLM cache: {e}")
+                self._counters["misses"] += 1
+                return None
+
+    def put(self, key: str, value, model: str, kind: str):
+        if not self.enabled:
+            return
+        encoded = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, kind, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, kind, encoded, len(encoded), now, now),
+                )
+                conn.commit()
+                self._counters["stores"] += 1
+                self._evict(conn, now)
+            except sqlite3.Error as e:
+                print(f"Error writing LLM cache: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drops expired entries, then least-recently-used ones until the cache fits in max_bytes."""
+        expired = conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        self._counters["expired"] += max(expired, 0)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._counters["evictions"] += len(doomed)
+        conn.commit()
+
+    def clear(self):
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error clearing LLM cache: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+llm_cache = LLMCache()
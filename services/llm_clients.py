@@ -0,0 +1,75 @@
+import time
+import threading
+from collections import OrderedDict
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+
+class ModelClientPool:
+    """
+    Keeps one configured GenerativeModel per (API key, model name), reused across requests
+    and sessions.
+
+    genai.configure() swaps the SDK's process-wide client, so two sessions with different keys
+    could send requests with each other's key. Instead, every key gets its own client manager
+    (the same one genai.configure fills in, minus the global state), and pooled models are
+    bound to that key's generative client directly. The pool is bounded (least-recently-used
+    entries go first) and entries idle for longer than idle_seconds are dropped.
+    """
+
+    def __init__(self, max_size: int = 32, idle_seconds: float = 1800):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._models = OrderedDict()  # (api_key, model_name) -> [model, last_used]
+        self._managers = {}  # api_key -> _ClientManager
+        self._lock = threading.Lock()
+
+    def _manager(self, api_key: str):
+        manager = self._managers.get(api_key)
+        if manager is None:
+            manager = genai_client._ClientManager()
+            manager.configure(api_key=api_key)
+            self._managers[api_key] = manager
+        return manager
+
+    def get_model(self, api_key: str, model_name: str) -> genai.GenerativeModel:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._models.get((api_key, model_name))
+            if entry is None:
+                model = genai.GenerativeModel(model_name)
+                model._client = self._manager(api_key).get_default_client("generative")
+                entry = [model, now]
+                self._models[(api_key, model_name)] = entry
+                while len(self._models) > self.max_size:
+                    self._models.popitem(last=False)
+                self._drop_unused_managers()
+            else:
+                entry[1] = now
+                self._models.move_to_end((api_key, model_name))
+            return entry[0]
+
+    def get_client(self, api_key: str, name: str):
+        """Returns the key's SDK service client by name (e.g. 'model' for listing models)."""
+        with self._lock:
+            return self._manager(api_key).get_default_client(name)
+
+    def _evict_idle(self, now: float):
+        idle = [k for k, (_, last_used) in self._models.items() if now - last_used > self.idle_seconds]
+        for k in idle:
+            del self._models[k]
+        if idle:
+            self._drop_unused_managers()
+
+    def _drop_unused_managers(self):
+        in_use = {api_key for api_key, _ in self._models}
+        for api_key in [k for k in self._managers if k not in in_use]:
+            del self._managers[api_key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+
+model_pool = ModelClientPool()
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from .prompt_builder import estimate_tokens
+
+
+class CallTrace:
+    """
+    One LLM call in progress. LLMService fills in the fields as the call goes along and calls
+    finish() exactly once (in a finally block), which hands the record to LLMMetrics.
+    """
+    __slots__ = ('metrics', 'stage', 'kind', 'started', 'prompt', 'response', 'attempts', 'cache_hit', 'repaired', 'error')
+
+    def __init__(self, metrics, stage: str, kind: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.prompt = ""
+        self.response = None
+        self.attempts = 0
+        self.cache_hit = False
+        self.repaired = False
+        self.error = None
+
+    def counted(self, request):
+        """Wraps request(timeout) so every attempt made by call_with_retry is counted."""
+        def attempt(timeout: float):
+            self.attempts += 1
+            return request(timeout)
+        return attempt
+
+    def finish(self):
+        response = self.response if isinstance(self.response, str) else ""
+        record = {
+            "ts": time.time(),
+            "stage": self.stage,
+            "kind": self.kind,
+            "latency_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "prompt_chars": len(self.prompt),
+            "response_chars": len(response),
+            "prompt_tokens": estimate_tokens(self.prompt),
+            "response_tokens": estimate_tokens(response),
+            "attempts": self.attempts,
+            "retries": max(0, self.attempts - 1),
+            "cache_hit": self.cache_hit,
+            # No attempt of our own and no error: the response came from another session's identical call
+            "coalesced": not self.cache_hit and self.attempts == 0 and self.error is None,
+            "repaired": self.repaired,
+            "parse_error": isinstance(self.error, json.JSONDecodeError),
+            "error": f"{type(self.error).__name__}: {self.error}" if self.error is not None else None,
+        }
+        self.metrics.record(record)
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class LLMMetrics:
+    """
+    Per-stage LLM call metrics: a rolling window of the last `window` calls per stage (for
+    p50/p95 summaries) plus an append-only JSONL log of every call.
+
+    The log lives at LLM_METRICS_LOG (default .cache/llm_metrics.jsonl) and is rotated to
+    `<path>.1` past LLM_METRICS_LOG_MAX_MB. LLM_METRICS_DISABLED turns recording off.
+    """
+
+    def __init__(self, log_path: str = None, window: int = 500, max_log_bytes: int = None):
+        self.log_path = log_path or os.getenv("LLM_METRICS_LOG", os.path.join(".cache", "llm_metrics.jsonl"))
+        self.window = window
+        self.max_log_bytes = max_log_bytes or int(float(os.getenv("LLM_METRICS_LOG_MAX_MB", "16")) * 1024 * 1024)
+        self.enabled = not os.getenv("LLM_METRICS_DISABLED")
+        self._stages = {}  # stage -> deque of records
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def trace(self, stage: str, kind: str) -> CallTrace:
+        return CallTrace(self, stage, kind)
+
+    def record(self, record: dict):
+        if not self.enabled:
+            return
+        with self._lock:
+            calls = self._stages.get(record["stage"])
+            if calls is None:
+                calls = self._stages[record["stage"]] = deque(maxlen=self.window)
+            calls.append(record)
+        self._append_log(record)
+
+    def _append_log(self, record: dict):
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.max_log_bytes:
+                    os.replace(self.log_path, self.log_path + ".1")
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Error writing LLM metrics log: {e}")
+
+    def summary(self) -> dict:
+        """Rolling per-stage summary: call counts, latency p50/p95 (ms), token means and failure counts."""
+        with self._lock:
+            stages = {stage: list(calls) for stage, calls in self._stages.items()}
+
+        summary = {}
+        for stage, calls in stages.items():
+            # Latency percentiles cover calls that reached the provider; cache hits would mask them
+            latencies = sorted(c["latency_ms"] for c in calls if not c["cache_hit"])
+            n = len(calls)
+            summary[stage] = {
+                "calls": n,
+                "p50_ms": _percentile(latencies, 0.50),
+                "p95_ms": _percentile(latencies, 0.95),
+                "mean_prompt_tokens": round(sum(c["prompt_tokens"] for c in calls) / n),
+                "mean_response_tokens": round(sum(c["response_tokens"] for c in calls) / n),
+                "retries": sum(c["retries"] for c in calls),
+                "cache_hits": sum(c["cache_hit"] for c in calls),
+                "coalesced": sum(c["coalesced"] for c in calls),
+                "repairs": sum(c["repaired"] for c in calls),
+                "parse_errors": sum(c["parse_error"] for c in calls),
+                "errors": sum(c["error"] is not None for c in calls),
+            }
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+llm_metrics = LLMMetrics()
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from google.api_core import exceptions as api_exceptions
+
+# LLM_BACKEND: "live" (default), "record" (call the API and save every response) or
+# "replay" (serve saved responses, no network or API key needed)
+BACKENDS = ("live", "record", "replay")
+DEFAULT_FIXTURES_DIR = os.path.join("fixtures", "llm")
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class _Response:
+    """The part of a GenerateContentResponse LLMService uses."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class RecordingModel:
+    """Wraps a real GenerativeModel and appends every successful response to the stage's fixture file."""
+
+    def __init__(self, model, backend, stage: str):
+        self.model = model
+        self.backend = backend
+        self.stage = stage
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        started = time.perf_counter()
+        response = self.model.generate_content(prompt, stream=stream, **kwargs)
+        if not stream:
+            self.backend.save(self.stage, prompt, response.text, time.perf_counter() - started)
+            return response
+        return self._record_stream(prompt, response, started)
+
+    def _record_stream(self, prompt, stream, started):
+        parts = []
+        for chunk in stream:
+            try:
+                parts.append(chunk.text)
+            except ValueError:
+                pass
+            yield chunk
+        self.backend.save(self.stage, prompt, "".join(parts), time.perf_counter() - started)
+
+
+class ReplayModel:
+    """Serves recorded responses for one stage, with injected latency and failures."""
+
+    def __init__(self, backend, stage: str):
+        self.backend = backend
+        self.stage = stage
+
+    def generate_content(self, prompt, stream: bool = False, request_options: dict = None, **kwargs):
+        # A failed attempt doesn't use up a response, so the retry gets the same one
+        failing = self.backend.should_fail()
+        entry = self.backend.next_entry(self.stage, prompt, advance=not failing)
+        delay = self.backend.latency(entry)
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise api_exceptions.DeadlineExceeded(f"Replayed {self.stage} response exceeded the {timeout:.1f}s timeout")
+        time.sleep(delay)
+        if failing:
+            raise api_exceptions.ServiceUnavailable(f"Injected failure for stage '{self.stage}'")
+        if stream:
+            return iter([_Response(entry["response"])])
+        return _Response(entry["response"])
+
+
+class ReplayBackend:
+    """
+    Record/replay stand-in for the Gemini API, so the full pipeline can be benchmarked offline.
+
+    Fixtures are JSONL files per stage (`<fixtures_dir>/<stage>.jsonl`, one recorded response per
+    line). Replay serves the response recorded for the exact same prompt when there is one, and
+    otherwise walks the stage's responses in order (wrapping around), which keeps runs deterministic
+    even though narrative prompts carry a random seed.
+
+    Injected behaviour (env): LLM_REPLAY_LATENCY_SCALE multiplies the recorded latency (0 = instant),
+    LLM_REPLAY_LATENCY_MS replaces it with a fixed value, LLM_REPLAY_FAILURE_RATE (0-1) makes that
+    share of calls fail with a retryable ServiceUnavailable, LLM_REPLAY_SEED seeds the failures.
+    """
+
+    def __init__(self, mode: str = "replay", fixtures_dir: str = None, latency_scale: float = None,
+                 latency_ms: float = None, failure_rate: float = None, seed: int = None):
+        self.mode = mode
+        self.fixtures_dir = fixtures_dir or os.getenv("LLM_FIXTURES_DIR", DEFAULT_FIXTURES_DIR)
+        self.latency_scale = latency_scale if latency_scale is not None else float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1"))
+        if latency_ms is None and os.getenv("LLM_REPLAY_LATENCY_MS"):
+            latency_ms = float(os.getenv("LLM_REPLAY_LATENCY_MS"))
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv("LLM_REPLAY_FAILURE_RATE", "0"))
+        self.seed = seed if seed is not None else int(os.getenv("LLM_REPLAY_SEED", "0"))
+        self._lock = threading.Lock()
+        self._fixtures = {}  # stage -> (entries, {prompt hash: entry})
+        self._cursors = {}
+        self._rng = random.Random(self.seed)
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == "replay"
+
+    def model(self, stage: str, live_model):
+        """The model object LLMService should call for `stage`; `live_model()` builds the real one."""
+        stage = stage or "default"
+        if self.mode == "record":
+            return RecordingModel(live_model(), self, stage)
+        return ReplayModel(self, stage)
+
+    # --- Recording ---
+
+    def _path(self, stage: str) -> str:
+        return os.path.join(self.fixtures_dir, f"{stage}.jsonl")
+
+    def save(self, stage: str, prompt: str, response: str, latency: float):
+        entry = {
+            "stage": stage,
+            "prompt_sha256": prompt_hash(prompt),
+            "prompt_chars": len(prompt),
+            "response": response,
+            "latency_ms": round(latency * 1000, 1),
+            "recorded_at": time.time(),
+        }
+        try:
+            with self._lock:
+                os.makedirs(self.fixtures_dir, exist_ok=True)
+                with open(self._path(stage), 'a') as f:
+                    f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Error recording LLM fixture for {stage}: {e}")
+
+    # --- Replay ---
+
+    def _load(self, stage: str):
+        with self._lock:
+            if stage not in self._fixtures:
+                entries = []
+                try:
+                    with open(self._path(stage)) as f:
+                        entries = [json.loads(line) for line in f if line.strip()]
+                except OSError:
+                    pass
+                self._fixtures[stage] = (entries, {e.get("prompt_sha256"): e for e in entries})
+            return self._fixtures[stage]
+
+    def next_entry(self, stage: str, prompt: str, advance: bool = True) -> dict:
+        entries, by_prompt = self._load(stage)
+        if not entries:
+            raise FileNotFoundError(f"No recorded LLM responses for stage '{stage}' in {self.fixtures_dir}")
+        entry = by_prompt.get(prompt_hash(prompt))
+        if entry is not None:
+            return entry
+        with self._lock:
+            cursor = self._cursors.get(stage, 0)
+            if advance:
+                self._cursors[stage] = cursor + 1
+        return entries[cursor % len(entries)]
+
+    def latency(self, entry: dict) -> float:
+        if self.latency_ms is not None:
+            return self.latency_ms / 1000
+        return entry.get("latency_ms", 0) / 1000 * self.latency_scale
+
+    def should_fail(self) -> bool:
+        if not self.failure_rate:
+            return False
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def reset(self):
+        """Rewinds every stage and the failure sequence, so a run can be repeated exactly."""
+        with self._lock:
+            self._cursors.clear()
+            self._rng = random.Random(self.seed)
+
+
+def backend_from_env():
+    """The ReplayBackend selected by LLM_BACKEND, or None for live calls."""
+    mode = os.getenv("LLM_BACKEND", "live").lower()
+    if mode not in BACKENDS:
+        print(f"Unknown LLM_BACKEND '{mode}', using live calls")
+        return None
+    return None if mode == "live" else ReplayBackend(mode)
+
+
+llm_backend = backend_from_env()
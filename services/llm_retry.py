@@ -0,0 +1,145 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from google.api_core import exceptions as api_exceptions
+
+# Transient failures worth another attempt. Everything else (bad key, invalid request,
+# unparseable output) fails straight away.
+RETRYABLE_ERRORS = (
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.InternalServerError,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.Aborted,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Bounded retries with exponential backoff and jitter.
+
+    Attempt n (0-based) waits a random time in [0, min(max_backoff, initial_backoff * multiplier**n)]
+    before retrying ("full jitter"), so concurrent sessions hitting the same outage don't retry in lockstep.
+    """
+    max_attempts: int = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+    timeout: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    initial_backoff: float = 1.0
+    max_backoff: float = 16.0
+    multiplier: float = 2.0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.initial_backoff * self.multiplier ** attempt))
+
+
+class ConcurrencyLimiter:
+    """
+    Process-wide cap on in-flight LLM requests, shared by sync callers (threads) and async
+    callers (any event loop). Async callers poll instead of blocking, so they stay cancellable.
+    """
+
+    def __init__(self, limit: int = None):
+        self.limit = limit or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self._semaphore = threading.BoundedSemaphore(self.limit)
+
+    @contextmanager
+    def slot(self, deadline: float):
+        if not self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise TimeoutError("Timed out waiting for a free LLM request slot")
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def aacquire(self, deadline: float):
+        """Takes a slot without blocking the event loop; the caller must release() it."""
+        while not self._semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise TimeoutError("Timed out waiting for a free LLM request slot")
+            await asyncio.sleep(0.05)
+
+    def release(self, *_):
+        self._semaphore.release()
+
+
+llm_limiter = ConcurrencyLimiter()
+
+# Worker threads for async callers. A dedicated pool (rather than the event loop's default
+# executor) means asyncio.run() never waits on abandoned requests of cancelled tasks at shutdown.
+_llm_executor = ThreadPoolExecutor(max_workers=llm_limiter.limit, thread_name_prefix="llm")
+
+
+def call_with_retry(request, policy: RetryPolicy = None, limiter: ConcurrencyLimiter = None, timeout: float = None, rate_limit=None):
+    """
+    Runs `request(attempt_timeout)` with retries until it succeeds, fails with a non-retryable
+    error, runs out of attempts or passes the overall deadline (`timeout`, seconds across all attempts).
+    `request` must honour the per-attempt timeout it is given (the remaining time to the deadline).
+    With `rate_limit` (a TokenBucket), every attempt first waits for a token.
+    """
+    policy = policy or RetryPolicy()
+    limiter = limiter or llm_limiter
+    deadline = time.monotonic() + (timeout or policy.timeout)
+
+    for attempt in range(policy.max_attempts):
+        try:
+            if rate_limit is not None:
+                rate_limit.acquire(deadline)
+            with limiter.slot(deadline):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("LLM request deadline exceeded")
+                return request(remaining)
+        except Exception as e:
+            delay = policy.backoff(attempt)
+            if not is_retryable(e) or attempt == policy.max_attempts - 1 or time.monotonic() + delay >= deadline:
+                raise
+            print(f"LLM request failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def acall_with_retry(request, policy: RetryPolicy = None, limiter: ConcurrencyLimiter = None, timeout: float = None, rate_limit=None):
+    """
+    Async counterpart of call_with_retry. The blocking `request` runs in a worker thread, so it
+    uses the same pooled sync clients; each attempt is also bounded with asyncio.wait_for.
+    A thread can't be stopped, so an attempt that times out keeps its slot until its thread
+    returns: the limiter caps the requests actually in flight, not just the ones awaited.
+    """
+    policy = policy or RetryPolicy()
+    limiter = limiter or llm_limiter
+    deadline = time.monotonic() + (timeout or policy.timeout)
+
+    for attempt in range(policy.max_attempts):
+        try:
+            if rate_limit is not None:
+                await rate_limit.aacquire(deadline)
+            await limiter.aacquire(deadline)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                limiter.release()
+                raise TimeoutError("LLM request deadline exceeded")
+            try:
+                future = _llm_executor.submit(request, remaining)
+            except BaseException:
+                limiter.release()
+                raise
+            future.add_done_callback(limiter.release)
+            return await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+        except Exception as e:
+            delay = policy.backoff(attempt)
+            if not is_retryable(e) or attempt == policy.max_attempts - 1 or time.monotonic() + delay >= deadline:
+                raise
+            print(f"LLM request failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
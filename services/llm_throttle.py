@@ -0,0 +1,177 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+
+
+class RateLimited(RuntimeError):
+    """No request slot within the deadline. Deliberately not retryable: waiting longer is the limit."""
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight requests: the first caller for a key runs the request, callers
+    that arrive while it is running wait for its result instead of issuing their own.
+
+    Only successes are shared. If the leading call fails, each waiting caller runs the request
+    itself, so one session's bad key or timeout never becomes another session's error.
+    Followers wait at most `timeout` seconds (their own budget, not the leader's); after that
+    they stop waiting and run the request themselves.
+    Works across threads (do) and event loops (ado).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future
+        self.coalesced = 0
+
+    def _join(self, key: str):
+        """Returns (future, is_leader)."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn, timeout: float = None):
+        future, leader = self._join(key)
+        if not leader:
+            try:
+                return future.result(timeout=timeout)
+            except Exception:
+                # Leader failed or is taking longer than this caller can wait
+                return fn()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, coro_fn, timeout: float = None):
+        future, leader = self._join(key)
+        if not leader:
+            try:
+                # Shield: a cancelled (or timed out) follower must not cancel the leader's shared future
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                return await coro_fn()
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class TokenBucket:
+    """
+    Token bucket for one API key: `rate` requests per second on average, bursts up to `capacity`.
+
+    Callers over the limit queue by reserving the next free token time and sleeping until then
+    (first come, first served). A caller whose turn would come after its deadline is rejected
+    straight away with RateLimited instead of waiting and failing anyway.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._metrics = {"acquired": 0, "queued": 0, "rejected": 0, "queue_depth": 0, "max_queue_depth": 0, "wait_seconds": 0.0}
+
+    def _reserve(self, deadline: float) -> float:
+        """Takes a token (possibly in the future) and returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                self._metrics["rejected"] += 1
+                raise RateLimited("LLM rate limit: no request slot before the deadline")
+            self._tokens -= 1
+            self._metrics["acquired"] += 1
+            if wait:
+                self._metrics["queued"] += 1
+                self._metrics["wait_seconds"] += wait
+                self._metrics["queue_depth"] += 1
+                self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], self._metrics["queue_depth"])
+            return wait
+
+    def _leave_queue(self):
+        with self._lock:
+            self._metrics["queue_depth"] -= 1
+
+    def acquire(self, deadline: float):
+        wait = self._reserve(deadline)
+        if wait:
+            try:
+                time.sleep(wait)
+            finally:
+                self._leave_queue()
+
+    async def aacquire(self, deadline: float):
+        wait = self._reserve(deadline)
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._leave_queue()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._metrics)
+
+
+class RateLimiter:
+    """Token buckets per API key (keys are only kept as hashes), created on first use."""
+
+    def __init__(self, per_minute: float = None, burst: float = None):
+        self.per_minute = per_minute or float(os.getenv("LLM_RATE_PER_MINUTE", "30"))
+        self.burst = burst or float(os.getenv("LLM_RATE_BURST", "5"))
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _key_id(self, api_key: str) -> str:
+        return hashlib.sha256((api_key or "").encode('utf-8')).hexdigest()[:12]
+
+    def bucket(self, api_key: str) -> TokenBucket:
+        key_id = self._key_id(api_key)
+        with self._lock:
+            bucket = self._buckets.get(key_id)
+            if bucket is None:
+                bucket = self._buckets[key_id] = TokenBucket(self.per_minute / 60.0, self.burst)
+            return bucket
+
+    def stats(self) -> dict:
+        """Queue metrics per (hashed) API key."""
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {key_id: bucket.stats() for key_id, bucket in buckets.items()}
+
+
+llm_flights = SingleFlight()
+llm_rate_limiter = RateLimiter()
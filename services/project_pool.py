@@ -0,0 +1,156 @@
+import os
+import json
+import uuid
+import time
+import threading
+import pandas as pd
+from .generator import project_generator, DEFAULT_ROWS
+from .verifier import VerifierService
+
+
+class ProjectPool:
+    """
+    Bounded on-disk pool of ready projects (definition + verification as JSON, clean dataset as
+    Parquet) per quick-start sector, kept full by a background thread.
+
+    Popping a project is a file rename, so a quick start costs a Parquet read instead of the full
+    narrative -> recipe -> data -> verify pipeline. Chaos is still applied per session afterwards.
+    The worker only runs with a server-side GEMINI_API_KEY: a visitor's own key is never used for
+    background work, and in mock mode generation is instant anyway.
+    """
+
+    def __init__(self, pool_dir: str = None, per_sector: int = None, rows: int = DEFAULT_ROWS, refill_interval: float = 300):
+        self.pool_dir = pool_dir or os.getenv("PROJECT_POOL_DIR", os.path.join(".cache", "project_pool"))
+        self.per_sector = per_sector or int(os.getenv("PROJECT_POOL_SIZE", "2"))
+        self.rows = rows
+        self.refill_interval = refill_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._sectors = []
+        self._verifier = None
+
+    def _sector_dir(self, sector: str) -> str:
+        return os.path.join(self.pool_dir, "".join(c if c.isalnum() else "_" for c in sector.lower()))
+
+    def _entries(self, sector: str) -> list:
+        """Ready entries for a sector, oldest first. The JSON file is written last, so it marks a complete entry."""
+        sector_dir = self._sector_dir(sector)
+        try:
+            names = [n for n in os.listdir(sector_dir) if n.endswith('.json')]
+        except OSError:
+            return []
+        paths = [os.path.join(sector_dir, n) for n in names]
+        return sorted(paths, key=lambda p: os.stat(p).st_mtime if os.path.exists(p) else 0)
+
+    def size(self, sector: str) -> int:
+        return len(self._entries(sector))
+
+    def pop(self, sector: str, exclude: list = None, rows: int = None) -> dict:
+        """
+        Takes a ready project for `sector` whose history item isn't in `exclude` (the session's
+        generated_history). Returns {"definition", "data", "verification"} or None.
+        """
+        if (rows or self.rows) != self.rows:
+            return None
+        exclude = set(exclude or [])
+        result = None
+        for meta_path in self._entries(sector):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("history_item") in exclude:
+                continue
+
+            # Claim the entry atomically, so two sessions never get the same project
+            claimed_path = f"{meta_path}.{uuid.uuid4().hex}.claimed"
+            try:
+                os.rename(meta_path, claimed_path)
+            except OSError:
+                continue
+            data_path = meta_path[:-len('.json')] + '.parquet'
+            try:
+                df = pd.read_parquet(data_path)
+                result = {"definition": meta["definition"], "data": df, "verification": meta["verification"]}
+            except Exception as e:
+                print(f"Error reading pooled project {meta_path}: {e}")
+            finally:
+                for path in (claimed_path, data_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            if result is not None:
+                break
+
+        # Top the pool back up in the background
+        self._wake.set()
+        return result
+
+    def put(self, sector: str, project: dict):
+        sector_dir = self._sector_dir(sector)
+        os.makedirs(sector_dir, exist_ok=True)
+        entry_id = uuid.uuid4().hex
+        base = os.path.join(sector_dir, entry_id)
+        project["data"].to_parquet(base + '.parquet', compression='zstd', index=False)
+        meta = {
+            "sector": sector,
+            "rows": self.rows,
+            "created_at": time.time(),
+            "history_item": project_generator.history_item(project["definition"]),
+            "definition": project["definition"],
+            "verification": project["verification"],
+        }
+        tmp_path = f"{base}.json.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp_path, base + '.json')
+
+    def refill(self, sector: str, api_key: str):
+        """Generates projects for `sector` until it holds per_sector verified projects."""
+        while self.size(sector) < self.per_sector:
+            # Steer away from projects already waiting in the pool
+            pooled = []
+            for meta_path in self._entries(sector):
+                try:
+                    with open(meta_path) as f:
+                        pooled.append(json.load(f).get("history_item"))
+                except (OSError, ValueError):
+                    pass
+            project = project_generator.build_verified_project(sector, api_key, self._verifier, previous_context=pooled[-5:], rows=self.rows)
+            if "error" in project:
+                print(f"Project pool refill for {sector} failed: {project['error']}")
+                return
+            if not project["verification"].get('valid', True):
+                # Only verified projects are served instantly; the next refill tries again
+                return
+            self.put(sector, project)
+
+    def start(self, sectors: list):
+        """Starts the refill worker for `sectors` (once per process; later calls are no-ops)."""
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._sectors = list(sectors)
+            self._verifier = VerifierService()
+            self._thread = threading.Thread(target=self._run, args=(api_key,), name="project-pool", daemon=True)
+            self._thread.start()
+
+    def _run(self, api_key: str):
+        while True:
+            for sector in self._sectors:
+                try:
+                    self.refill(sector, api_key)
+                except Exception as e:
+                    print(f"Project pool refill for {sector} failed: {e}")
+            # Sleep until a pop needs a refill (or periodically retry failed sectors)
+            self._wake.wait(self.refill_interval)
+            self._wake.clear()
+
+
+project_pool = ProjectPool()
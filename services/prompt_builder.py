@@ -0,0 +1,222 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Add system instruction to prompt for Socratic guidance with code awareness
+SYSTEM_INSTRUCTION = """
+        You are a Senior Data Analyst mentor guiding a Junior Analyst.
+        You have access to the code they are currently writing in the IDE (if any) and the recent conversation history.
+
+        Guidelines:
+        1. If the user asks a direct question like "Will this code work?" or "What is wrong?", analyze the provided code context.
+           - If there is a syntax error or logical flaw, point it out specifically.
+           - If it looks correct, confirm it.
+        2. If the user is asking for the solution from scratch (e.g., "How do I do X?"), DO NOT provide the full code immediately.
+           - Instead, guide them: "Have you tried using groupby?" or "Look into the matplotlib plot function."
+           - Ask leading questions to help them derive the answer.
+        3. Balance being helpful (unblocking them) with being educational (making them think).
+           - If they are clearly stuck after trying, you can provide a small snippet or corrected syntax, but avoid writing the whole script if possible.
+        4. Be encouraging and constructive.
+        """
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token), good enough for budgeting."""
+    return math.ceil(len(text) / 4)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + "...(truncated)"
+
+
+class PromptBuilder:
+    """
+    Builds mentor prompts within a token budget.
+
+    - The static prefix (system instruction + project context) is built once per project.
+    - Only the last `recent_turns` messages are quoted; older turns are folded into a running
+      extractive summary (first sentence of each turn) that is extended incrementally.
+    - If the prompt is still over budget, the lowest-value parts go first: outputs of older
+      cells, then older cell sources, then the summary, then older recent turns. The question,
+      the prefix and the latest cell are always kept.
+    """
+
+    def __init__(self, budget_tokens: int = None, recent_turns: int = 6, summary_chars: int = 1500, max_cell_chars: int = 2000):
+        self.budget_tokens = budget_tokens or int(os.getenv("MENTOR_PROMPT_TOKEN_BUDGET", "6000"))
+        self.recent_turns = recent_turns
+        self.summary_chars = summary_chars
+        self.max_cell_chars = max_cell_chars
+        self._prefixes = OrderedDict()   # project hash -> prefix text
+        self._summaries = OrderedDict()  # conversation hash -> (turns summarized, hash of those turns, lines)
+        self._lock = threading.Lock()
+        self.max_entries = 128
+
+    # --- Static prefix ---
+
+    def prefix(self, project_context: dict = None) -> str:
+        key = hashlib.sha256(json.dumps(project_context or {}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        with self._lock:
+            cached = self._prefixes.get(key)
+            if cached is not None:
+                self._prefixes.move_to_end(key)
+                return cached
+
+        prefix = f"{SYSTEM_INSTRUCTION}\n{self._project_block(project_context)}"
+        with self._lock:
+            self._prefixes[key] = prefix
+            while len(self._prefixes) > self.max_entries:
+                self._prefixes.popitem(last=False)
+        return prefix
+
+    def _project_block(self, project_context: dict) -> str:
+        # Construct project context string
+        project_str = ""
+        if project_context:
+            project_str = "\n\n--- Project Context ---\n"
+            project_str += f"Title: {project_context.get('title', 'N/A')}\n"
+            project_str += f"Scenario: {project_context.get('description', 'N/A')}\n"
+            if 'tasks' in project_context:
+                project_str += "Tasks:\n"
+                for i, task in enumerate(project_context['tasks']):
+                    project_str += f"{i+1}. {task}\n"
+
+            schema = project_context.get('display_schema') or project_context.get('schema')
+            if schema:
+                project_str += "Schema:\n"
+                for col in schema:
+                    project_str += f"- {col.get('name')} ({col.get('type')})\n"
+
+            project_str += "-----------------------\n"
+        return project_str
+
+    # --- Conversation ---
+
+    def _summarize_turn(self, msg: dict) -> str:
+        role = "User" if msg['role'] == 'user' else "Mentor"
+        first_sentence = _SENTENCE_END.split(str(msg['content']).strip(), maxsplit=1)[0]
+        return f"{role}: {_truncate(' '.join(first_sentence.split()), 160)}"
+
+    def summary(self, older: list) -> str:
+        """Running summary of the turns before the quoted window, extended one turn at a time."""
+        if not older:
+            return ""
+        # A conversation is identified by its first turn; the stored hash guards against edits
+        conv_key = hashlib.sha256(str(older[0].get('content')).encode('utf-8')).hexdigest()
+        with self._lock:
+            done, done_hash, lines = self._summaries.get(conv_key, (0, None, []))
+        if done > len(older) or (done and self._turns_hash(older[:done]) != done_hash):
+            done, lines = 0, []
+        lines = lines + [self._summarize_turn(m) for m in older[done:]]
+        with self._lock:
+            self._summaries[conv_key] = (len(older), self._turns_hash(older), lines)
+            self._summaries.move_to_end(conv_key)
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+
+        # Keep the most recent lines that fit
+        kept, size = [], 0
+        for line in reversed(lines):
+            if size + len(line) > self.summary_chars:
+                kept.append("(earlier discussion omitted)")
+                break
+            kept.append(line)
+            size += len(line)
+        return "\n\n--- Earlier Conversation (summary) ---\n" + "\n".join(reversed(kept)) + "\n-------------------------------------\n"
+
+    def _turns_hash(self, turns: list) -> str:
+        digest = hashlib.sha256()
+        for m in turns:
+            digest.update(f"{m.get('role')}\x00{m.get('content')}\x00".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _history_block(self, recent: list) -> str:
+        if not recent:
+            return ""
+        # Construct conversation history string
+        history_str = "\n\n--- Conversation History ---\n"
+        for msg in recent:
+            role = "User" if msg['role'] == 'user' else "Mentor"
+            history_str += f"{role}: {msg['content']}\n"
+        history_str += "----------------------------\n"
+        return history_str
+
+    # --- Notebook ---
+
+    def _cells(self, code_context: dict) -> list:
+        """Notebook cells as [header+source, output] pairs, so outputs can be dropped separately."""
+        cells = []
+        for idx, cell in enumerate(code_context.get("notebook") or []):
+            c_type = cell.get('cell_type', 'unknown').upper()
+            content = _truncate(cell.get('source', '').strip(), self.max_cell_chars)
+            output = str(cell.get('output', '')).strip()
+            source = f"Cell {idx+1} [{c_type}]:\n{content}\n"
+            # Truncate output if it's too long to avoid token limits
+            cells.append([source, f"Output:\n{_truncate(output, 500)}\n" if output else ""])
+        return cells
+
+    def _code_block(self, code_context: dict, cells: list) -> str:
+        if not code_context:
+            return ""
+        code_str = "\n\n--- User's Current Notebook ---\n"
+        for source, output in cells:
+            code_str += f"{source}{output}\n"
+
+        # Fallback for legacy keys (if any)
+        if code_context.get("python"):
+            code_str += f"Python IDE:\n{code_context['python']}\n\n"
+        if code_context.get("sql"):
+            code_str += f"SQL IDE:\n{code_context['sql']}\n"
+
+        code_str += "---------------------------\n"
+        return code_str
+
+    # --- Assembly ---
+
+    def build(self, prompt: str, project_context: dict = None, code_context: dict = None, history: list = None) -> str:
+        history = history or []
+        split = max(0, len(history) - self.recent_turns)
+        older, recent = history[:split], history[split:]
+
+        prefix = self.prefix(project_context)
+        summary = self.summary(older)
+        cells = self._cells(code_context or {})
+        question = f"\nUser Question: {prompt}"
+
+        def assemble():
+            return f"{prefix}\n{self._code_block(code_context, cells)}\n{summary}{self._history_block(recent)}{question}"
+
+        full_prompt = assemble()
+        if estimate_tokens(full_prompt) <= self.budget_tokens:
+            return full_prompt
+
+        # Trim lowest-value parts first, re-checking the budget after each step
+        def trimmed():
+            for cell in cells[:-1]:
+                if cell[1]:
+                    cell[1] = ""
+                    yield
+            for i, cell in enumerate(cells[:-1]):
+                cell[0] = f"Cell {i+1}: (omitted)\n"
+                yield
+            nonlocal summary
+            if summary:
+                summary = ""
+                yield
+            while len(recent) > 2:
+                recent.pop(0)
+                yield
+
+        for _ in trimmed():
+            full_prompt = assemble()
+            if estimate_tokens(full_prompt) <= self.budget_tokens:
+                break
+        return full_prompt
+
+
+prompt_builder = PromptBuilder()
@@ -0,0 +1,429 @@
+import re
+import json
+import math
+import functools
+from dataclasses import dataclass, field
+from .dataset_cache import canonicalize_recipe
+from .faker_pool import faker_pool
+
+# Faker methods that are too generic for columns whose name implies a finite set of values
+GENERIC_FAKER_METHODS = {'word', 'words', 'sentence', 'text', 'lorem', 'string'}
+CATEGORICAL_KEYWORDS = ['status', 'type', 'category', 'class', 'tier', 'mode', 'segment', 'group', 'level', 'priority', 'region', 'department', 'platform', 'channel']
+LEGACY_CATEGORICAL_KEYWORDS = CATEGORICAL_KEYWORDS[:-2]
+
+# Schema types the LLM uses interchangeably
+TYPE_ALIASES = {
+    'anchor': 'categorical',
+    'string': 'text',
+    'integer': 'numeric', 'int': 'numeric', 'float': 'numeric', 'number': 'numeric',
+    'datetime': 'date',
+    'bool': 'boolean',
+}
+
+# Column kind -> type understood by ChaosToolkit
+CHAOS_TYPES = {
+    'categorical': 'categorical',
+    'numeric': 'numeric',
+    'boolean': 'categorical',
+    'date': 'date',
+    'faker': 'string',
+}
+
+_NON_IDENTIFIER = re.compile(r'[^a-z0-9_]')
+
+
+def sanitize_column_name(name: str) -> str:
+    # Lowercase, spaces to underscores, drop anything else that isn't alphanumeric
+    name = _NON_IDENTIFIER.sub('', str(name).lower().replace(" ", "_"))
+    # Ensure it doesn't start with a number
+    if name and name[0].isdigit():
+        name = "_" + name
+    return name
+
+
+def normalize_weights(weights, n_options: int):
+    """Returns weights as floats summing to 1, or None when they are missing or unusable."""
+    if not weights:
+        return None
+    try:
+        weights = [float(w) for w in weights]
+    except (TypeError, ValueError):
+        return None
+    total = sum(weights)
+    if len(weights) != n_options or total <= 0:
+        return None
+    return tuple(w / total for w in weights)
+
+
+def placeholder_options(title: str, letters: str = 'ABCD') -> tuple:
+    clean_title = title.replace('_', ' ').title()
+    return tuple(f"{clean_title} {char}" for char in letters)
+
+
+@dataclass(slots=True, frozen=True)
+class ColumnSpec:
+    """One fully-resolved column: what to generate, and with which parameters."""
+    name: str
+    kind: str                       # 'categorical', 'numeric', 'boolean', 'date', 'faker'
+    options: tuple = ()
+    weights: tuple = None
+    low: float = 0
+    high: float = 100
+    is_float: bool = False
+    faker_method: str = None
+    range_start: str = None
+    range_end: str = None
+    depends_on: str = None
+    offset_min: int = 0
+    offset_max: int = 30
+    date_objects: bool = False      # Legacy recipes produce datetime.date values instead of datetime64
+    probability: float = 0.5        # Share of True values in a boolean column
+    rules: tuple = None             # Raw per-anchor rules: ((anchor_value, (low, high) or probability), ...)
+    rule_low: tuple = None          # Rules bound to the anchor's categories (index = category code)
+    rule_high: tuple = None
+    rule_prob: tuple = None
+
+    @property
+    def conditional(self) -> bool:
+        return self.depends_on is not None and self.kind in ('numeric', 'boolean')
+
+    @property
+    def chaos_type(self) -> str:
+        return CHAOS_TYPES[self.kind]
+
+
+@dataclass(slots=True, frozen=True)
+class RecipePlan:
+    """
+    A recipe compiled once into typed columns.
+    `columns` is in dependency order (generate in this order), `output_order` is the
+    order of the final DataFrame, and `issues` lists dependencies that had to be dropped.
+    """
+    columns: tuple
+    output_order: tuple
+    issues: tuple = ()
+    legacy: bool = False
+    by_name: dict = field(default_factory=dict, compare=False)
+
+    @property
+    def col_types(self) -> dict:
+        return {spec.name: spec.chaos_type for spec in self.columns}
+
+
+def compile_recipe(recipe: dict) -> RecipePlan:
+    """
+    Compiles any recipe (schema-first definition, legacy definition or bare legacy recipe)
+    into a RecipePlan. Plans are cached by canonical recipe, so repeated calls are a dict lookup.
+    """
+    canonical = json.dumps(canonicalize_recipe(recipe), sort_keys=True, default=str)
+    return _compile_canonical(canonical)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_canonical(canonical: str) -> RecipePlan:
+    recipe = json.loads(canonical)
+    issues = []
+    if recipe.get('schema_list'):
+        specs = _compile_schema_list(recipe['schema_list'], issues)
+        legacy = False
+    else:
+        specs = _compile_legacy(recipe, issues)
+        legacy = True
+
+    # Later duplicates win, like the dict assignment generation used to do
+    unique = {}
+    for spec in specs:
+        unique.pop(spec.name, None)
+        unique[spec.name] = spec
+
+    issues.extend(_bind_conditionals(unique))
+    ordered, dependency_issues = _resolve_dependencies(unique)
+    issues.extend(dependency_issues)
+    return RecipePlan(
+        columns=tuple(ordered),
+        output_order=tuple(unique),
+        issues=tuple(issues),
+        legacy=legacy,
+        by_name={spec.name: spec for spec in ordered},
+    )
+
+
+def _compile_schema_list(schema: list, issues: list) -> list:
+    # Conditional (rule-based) columns default to the anchor, or the first column with options
+    anchor_cols = [c for c in schema if str(c.get('type', '')).lower() == 'anchor'] or [c for c in schema if c.get('options')]
+    anchor_name = sanitize_column_name(anchor_cols[0].get('name', '')) if anchor_cols else None
+
+    specs = []
+    for col in schema:
+        name = sanitize_column_name(col.get('name', ''))
+        if not name:
+            continue
+        col_type = str(col.get('type', 'text')).lower()
+        col_type = TYPE_ALIASES.get(col_type, col_type)
+
+        # PRIORITY CHECK: If options are explicitly provided, force categorical behavior
+        # (the LLM sometimes says type="text" but provides options).
+        # EXCEPTION: strictly 'numeric' columns ignore options to prevent string contamination.
+        if col.get('options') and col_type != 'numeric':
+            col_type = 'categorical'
+
+        if col_type == 'categorical':
+            options = tuple(col.get('options') or placeholder_options(name, 'ABC'))
+            specs.append(ColumnSpec(name, 'categorical', options=options, weights=normalize_weights(col.get('weights'), len(options))))
+
+        elif col_type in ('numeric', 'boolean') and isinstance(col.get('rules'), dict):
+            depends_on = sanitize_column_name(col['depends_on']) if col.get('depends_on') else anchor_name
+            specs.append(_conditional_spec(name, col_type, col['rules'], depends_on, issues))
+
+        elif col_type == 'numeric':
+            specs.append(_numeric_spec(name, col.get('min', 0), col.get('max', 100), issues))
+
+        elif col_type == 'boolean':
+            specs.append(ColumnSpec(name, 'boolean', probability=float(col.get('probability', 0.5))))
+
+        elif col_type == 'date':
+            specs.append(_date_spec(name, col, dependent='depends_on' in col))
+
+        else:
+            # 'id', 'text' and anything unrecognised are filled by Faker
+            specs.append(_faker_spec(name, col.get('faker_method', 'word'), CATEGORICAL_KEYWORDS, legacy=False))
+    return specs
+
+
+def _compile_legacy(recipe: dict, issues: list) -> list:
+    specs = []
+
+    # 1. Anchor
+    anchor = recipe.get('anchor_entity', {})
+    options = tuple(anchor.get('options') or ('Item A', 'Item B'))
+    specs.append(ColumnSpec(
+        sanitize_column_name(anchor.get('name', 'entity')), 'categorical',
+        options=options, weights=normalize_weights(anchor.get('weights'), len(options)),
+    ))
+
+    # 2. Categorical
+    for col in recipe.get('categorical_columns', []):
+        options = tuple(col.get('options') or placeholder_options(col['name'], 'ABC'))
+        specs.append(ColumnSpec(
+            sanitize_column_name(col['name']), 'categorical',
+            options=options, weights=normalize_weights(col.get('weights'), len(options)),
+        ))
+
+    # 3. Dates
+    for col in recipe.get('date_columns', []):
+        spec = _date_spec(sanitize_column_name(col['name']), col, dependent=col.get('type', 'base') == 'dependent')
+        specs.append(_replace(spec, date_objects=True))
+
+    # 4. Numeric (per-anchor rules when given, otherwise a simplified legacy range)
+    anchor_name = specs[0].name
+    for col in recipe.get('numeric_columns', []):
+        if isinstance(col.get('rules'), dict):
+            specs.append(_conditional_spec(sanitize_column_name(col['name']), 'numeric', col['rules'], anchor_name, issues))
+        else:
+            specs.append(_numeric_spec(sanitize_column_name(col['name']), 0, 99, issues))
+
+    # 4b. Correlated (numeric/boolean columns driven by the anchor value)
+    for col in recipe.get('correlated_columns', []):
+        kind = 'boolean' if str(col.get('type', 'numeric')).lower() in ('boolean', 'bool') else 'numeric'
+        specs.append(_conditional_spec(sanitize_column_name(col['name']), kind, col.get('rules') or {}, anchor_name, issues))
+
+    # 5. Faker (With Safety Net)
+    for col in recipe.get('faker_columns', []):
+        specs.append(_faker_spec(col['name'], col.get('faker_method', 'word'), LEGACY_CATEGORICAL_KEYWORDS, legacy=True))
+    return specs
+
+
+def _bound(value):
+    """A range bound as a number: numbers keep their type, numeric strings become int when whole."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        number = float(value)
+        value = int(number) if number.is_integer() else number
+    if not math.isfinite(value):
+        raise ValueError(f"non-finite bound {value!r}")
+    return value
+
+
+def _range(name: str, label: str, low, high, issues: list) -> tuple:
+    """(low, high) as numbers, swapped (and reported) if given the wrong way round."""
+    low, high = _bound(low), _bound(high)
+    if low > high:
+        issues.append(f"Column '{name}' has an inverted range for {label} ({low} > {high}); the bounds were swapped.")
+        low, high = high, low
+    return low, high
+
+
+def _numeric_spec(name: str, low, high, issues: list) -> ColumnSpec:
+    try:
+        low, high = _range(name, 'its values', low, high, issues)
+    except (TypeError, ValueError):
+        issues.append(f"Column '{name}' has an unreadable range ({low!r} to {high!r}); generated between 0 and 100.")
+        low, high = 0, 100
+    is_float = isinstance(low, float) or isinstance(high, float)
+    return ColumnSpec(name, 'numeric', low=low, high=high, is_float=is_float)
+
+
+def _conditional_spec(name: str, kind: str, rules: dict, depends_on: str, issues: list) -> ColumnSpec:
+    """
+    A numeric or boolean column whose range / probability depends on the value of a categorical column.
+    Rules look like {"Option": {"min": 0, "max": 10}} or {"Option": [0, 10]} (numeric) or
+    {"Option": 0.3} (boolean), with an optional "default" entry for options that have no rule.
+    Rules that can't be read are dropped and reported in `issues`.
+    """
+    parsed = []
+    default = None
+    for key, raw in rules.items():
+        value = raw
+        try:
+            if kind == 'boolean':
+                if isinstance(value, dict):
+                    value = value.get('probability', value.get('p', 0.5))
+                value = min(max(float(value), 0.0), 1.0)
+            elif isinstance(value, (list, tuple)) and len(value) == 2:
+                value = _range(name, f"'{key}'", value[0], value[1], issues)
+            else:
+                value = _range(name, f"'{key}'", value['min'], value['max'], issues)
+        except (KeyError, TypeError, ValueError, IndexError):
+            issues.append(f"Column '{name}' has an unreadable rule for '{key}' ({raw!r}); dropped, so that option uses the column's default.")
+            continue
+        if str(key).lower() == 'default':
+            default = value
+        else:
+            parsed.append((str(key), value))
+
+    if kind == 'boolean':
+        probability = default if default is not None else 0.5
+        return ColumnSpec(name, 'boolean', probability=probability, rules=tuple(parsed), depends_on=depends_on)
+
+    ranges = [value for _, value in parsed] + ([default] if default else [])
+    if default:
+        low, high = default
+    elif ranges:
+        low, high = min(r[0] for r in ranges), max(r[1] for r in ranges)
+    else:
+        low, high = 0, 100
+    is_float = any(isinstance(v, float) for r in ranges for v in r)
+    return ColumnSpec(name, 'numeric', low=low, high=high, is_float=is_float, rules=tuple(parsed), depends_on=depends_on)
+
+
+def _date_spec(name: str, col: dict, dependent: bool) -> ColumnSpec:
+    if dependent:
+        return ColumnSpec(
+            name, 'date',
+            depends_on=sanitize_column_name(col.get('depends_on', '')),
+            offset_min=int(col.get('offset_days_min', 0)),
+            offset_max=int(col.get('offset_days_max', 30)),
+        )
+    return ColumnSpec(
+        name, 'date',
+        range_start=col.get('range_start', '2023-01-01'),
+        range_end=col.get('range_end', '2023-12-31'),
+    )
+
+
+def _faker_spec(raw_name: str, method: str, keywords: list, legacy: bool) -> ColumnSpec:
+    name = sanitize_column_name(raw_name)
+    method = method or 'word'
+
+    # Interception Logic: generic text for a column that sounds categorical becomes placeholders
+    is_generic_method = method.lower() in GENERIC_FAKER_METHODS
+    name_implies_category = any(k in name for k in keywords)
+    if is_generic_method and name_implies_category:
+        return ColumnSpec(name, 'categorical', options=placeholder_options(raw_name if legacy else name))
+
+    if faker_pool.supports(method):
+        return ColumnSpec(name, 'faker', faker_method=method)
+
+    if legacy:
+        return ColumnSpec(name, 'categorical', options=placeholder_options(raw_name))
+
+    # Fallback Faker
+    if 'email' in name: method = 'email'
+    elif 'name' in name: method = 'name'
+    elif 'id' in name: method = 'uuid4'
+    else: method = 'word'
+    return ColumnSpec(name, 'faker', faker_method=method)
+
+
+def _replace(spec: ColumnSpec, **changes) -> ColumnSpec:
+    values = {f: getattr(spec, f) for f in ColumnSpec.__dataclass_fields__}
+    values.update(changes)
+    return ColumnSpec(**values)
+
+
+def _bind_conditionals(specs: dict) -> list:
+    """
+    Aligns each conditional column's rules with the category codes of the column it depends on,
+    so generation is a single np.take per column. Updates `specs` in place and returns issues.
+    """
+    issues = []
+    for name, spec in list(specs.items()):
+        if not spec.conditional:
+            continue
+        anchor = specs.get(spec.depends_on)
+        if anchor is None or anchor.kind != 'categorical':
+            issues.append(f"Column '{name}' has rules for unknown categorical column '{spec.depends_on}'; generated without them.")
+            specs[name] = _replace(spec, depends_on=None)
+            continue
+
+        # Match rule keys exactly first, then case-insensitively
+        exact = dict(spec.rules)
+        loose = {str(k).strip().lower(): v for k, v in spec.rules}
+        categories = list(dict.fromkeys(anchor.options))
+        matched = [exact.get(str(c), loose.get(str(c).strip().lower())) for c in categories]
+
+        if spec.kind == 'boolean':
+            specs[name] = _replace(spec, rule_prob=tuple(spec.probability if m is None else m for m in matched))
+        else:
+            specs[name] = _replace(
+                spec,
+                rule_low=tuple(spec.low if m is None else m[0] for m in matched),
+                rule_high=tuple(spec.high if m is None else m[1] for m in matched),
+            )
+    return issues
+
+
+def _resolve_dependencies(specs: dict):
+    """
+    Topologically sorts the columns (Kahn's algorithm) so every dependency is generated first.
+    Dependencies on missing or wrongly-typed columns, and dependency cycles, are dropped:
+    the affected columns are generated independently and the reason is recorded in `issues`.
+    """
+    issues = []
+    resolved = dict(specs)
+    for name, spec in specs.items():
+        dep = spec.depends_on
+        if dep is None:
+            continue
+        if dep not in specs or specs[dep].kind != ('date' if spec.kind == 'date' else 'categorical') or dep == name:
+            issues.append(f"Column '{name}' depends on unknown column '{dep}'; generated independently.")
+            resolved[name] = _replace(spec, depends_on=None)
+
+    # Each column has at most one parent, so a cycle is found by walking up the parent chain
+    on_cycle = set()
+    for name in resolved:
+        seen = []
+        node = name
+        while node is not None and node not in seen and node not in on_cycle:
+            seen.append(node)
+            node = resolved[node].depends_on
+        if node is not None and node in seen:
+            on_cycle.update(seen[seen.index(node):])
+    if on_cycle:
+        cyclic = [name for name in resolved if name in on_cycle]
+        issues.append(f"Date columns {', '.join(cyclic)} depend on each other in a cycle; generated as independent dates.")
+        for name in cyclic:
+            resolved[name] = _replace(resolved[name], depends_on=None)
+
+    dependents = {}
+    for name, spec in resolved.items():
+        if spec.depends_on:
+            dependents.setdefault(spec.depends_on, []).append(name)
+
+    ordered = []
+    queue = [name for name, spec in resolved.items() if spec.depends_on is None]
+    while queue:
+        name = queue.pop(0)
+        ordered.append(resolved[name])
+        queue.extend(dependents.get(name, []))
+
+    return ordered, issues
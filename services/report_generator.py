@@ -6,6 +6,7 @@ import html
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 from matplotlib.axes import Axes
+from .sql_engine import SQLResult
 
 def generate_html_report(project_title, project_description, cells):
     """
@@ -211,6 +212,10 @@ def generate_html_report(project_title, project_description, cells):
 
                 # Result Object
                 if result is not None:
+                    # SQL results are Arrow; only the rows shown are converted
+                    if isinstance(result, SQLResult):
+                        result = result.head(101)
+
                     # Pandas DataFrame
                     if isinstance(result, pd.DataFrame):
                         if len(result) > 100:
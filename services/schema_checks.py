@@ -0,0 +1,177 @@
+import pandas as pd
+from dataclasses import dataclass, field
+from .recipe_plan import compile_recipe, sanitize_column_name, placeholder_options, GENERIC_FAKER_METHODS, TYPE_ALIASES
+
+# Declared (display) types mapped onto what can be checked mechanically
+DECLARED_TYPES = {
+    'numeric': 'numeric', 'currency': 'numeric', 'decimal': 'numeric', 'percentage': 'numeric',
+    'boolean': 'boolean',
+    'date': 'date', 'timestamp': 'date',
+    'categorical': 'categorical',
+    'text': 'text', 'id': 'text', 'name': 'text', 'email': 'text',
+}
+
+BOOLEAN_TOKENS = {'true', 'false', 'yes', 'no', 'y', 'n', '1', '0', 't', 'f'}
+
+# Values checked per column when a full-column parse would be wasted work
+SAMPLE_ROWS = 5000
+
+
+@dataclass(slots=True)
+class SchemaCheck:
+    """
+    Outcome of the local pre-pass.
+    status: 'pass' (mechanically clean), 'fail' (concrete blockers in `issues`) or 'escalate'
+    (mechanically fine, but `notes` lists things only a semantic audit can judge).
+    Only 'fail' is final: a clean dataset can still miss the columns its tasks need,
+    which only the LLM audit can judge.
+    """
+    status: str
+    issues: list = field(default_factory=list)
+    notes: list = field(default_factory=list)
+
+    def report(self) -> dict:
+        """The verifier's JSON report for a failed check (no LLM audit needed)."""
+        return {"valid": False, "score": 0, "issues": self.issues, "source": "local"}
+
+
+def declared_schema(definition: dict) -> list:
+    """The schema the user is shown: schema_list for schema-first recipes, display_schema for legacy ones."""
+    if definition.get('schema_list'):
+        return definition['schema_list']
+    return definition.get('display_schema', [])
+
+
+def _declared_type(col: dict) -> str:
+    raw = str(col.get('type', '')).lower().split('/')[0].strip()
+    raw = TYPE_ALIASES.get(raw, raw)
+    return DECLARED_TYPES.get(raw)
+
+
+def _examples(values) -> str:
+    return ", ".join(repr(v) for v in list(values)[:3])
+
+
+def _sample(series: pd.Series) -> pd.Series:
+    series = series.dropna()
+    return series if len(series) <= SAMPLE_ROWS else series.sample(SAMPLE_ROWS, random_state=0)
+
+
+def _check_numeric(name: str, series: pd.Series, issues: list, notes: list):
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return
+    if pd.api.types.is_bool_dtype(series.dtype):
+        issues.append(f"Column '{name}' is declared numeric but contains only True/False values.")
+        return
+    values = _sample(series)
+    parsed = pd.to_numeric(values.astype(str), errors='coerce')
+    share = parsed.notna().mean() if len(values) else 0.0
+    if share == 0:
+        issues.append(f"Column '{name}' is declared numeric but contains only text values (e.g. {_examples(values.unique())}).")
+    elif share < 1:
+        notes.append(f"Column '{name}' is declared numeric but {1 - share:.0%} of its values are not numbers.")
+
+
+def _check_boolean(name: str, series: pd.Series, issues: list, notes: list):
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return
+    values = _sample(series)
+    tokens = values.astype(str).str.strip().str.lower()
+    share = tokens.isin(BOOLEAN_TOKENS).mean() if len(values) else 0.0
+    if share == 0:
+        issues.append(f"Column '{name}' is declared boolean but contains values like {_examples(values.unique())}.")
+    elif share < 1:
+        notes.append(f"Column '{name}' is declared boolean but has non True/False values.")
+
+
+def _check_date(name: str, series: pd.Series, issues: list, notes: list):
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        # to_datetime would happily read numbers as epoch offsets
+        issues.append(f"Column '{name}' is declared as a date but contains {series.dtype} values.")
+        return
+    values = _sample(series)
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    share = parsed.notna().mean() if len(values) else 0.0
+    if share == 0:
+        issues.append(f"Column '{name}' is declared as a date but contains values like {_examples(values.unique())}.")
+    elif share < 1:
+        notes.append(f"Column '{name}' is declared as a date but {1 - share:.0%} of its values are not dates.")
+
+
+def _check_options(name: str, series: pd.Series, options: list, issues: list):
+    allowed = set(map(str, options))
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Only the categories in use need checking, not every row
+        present = series.cat.remove_unused_categories().cat.categories
+        unexpected = [v for v in present if str(v) not in allowed]
+    else:
+        values = series.dropna()
+        unexpected = values[~values.astype(str).isin(allowed)].unique()
+    if len(unexpected):
+        issues.append(f"Column '{name}' has values outside its declared options (e.g. {_examples(unexpected)}).")
+
+
+def check_dataset(definition: dict, df: pd.DataFrame) -> SchemaCheck:
+    """
+    Mechanically compares a generated (pre-chaos) dataset with the schema the user is shown:
+    empty frames, missing or all-null columns, numeric/boolean/date columns whose values are not
+    of that type, and categorical values outside the declared options.
+    Anything that needs judgement (generic text, placeholder categories, partial type matches,
+    unrecognised declared types) is collected as a note and escalated to the LLM audit.
+    """
+    if df is None or df.empty:
+        return SchemaCheck('fail', ["Dataset is empty."])
+
+    issues = []
+    notes = []
+    plan = compile_recipe(definition)
+    notes.extend(plan.issues)
+
+    schema = declared_schema(definition)
+    if not schema:
+        return SchemaCheck('escalate', notes=["No declared schema to compare against."])
+
+    for col in schema:
+        raw_name = col.get('name', '')
+        name = sanitize_column_name(raw_name)
+        if not name:
+            continue
+        if name not in df.columns:
+            issues.append(f"Column '{raw_name}' is in the schema but missing from the generated data.")
+            continue
+
+        series = df[name]
+        if series.isna().all():
+            issues.append(f"Column '{raw_name}' contains no values.")
+            continue
+
+        declared = _declared_type(col)
+        if declared == 'numeric':
+            _check_numeric(raw_name, series, issues, notes)
+        elif declared == 'boolean':
+            _check_boolean(raw_name, series, issues, notes)
+        elif declared == 'date':
+            _check_date(raw_name, series, issues, notes)
+        elif declared in ('text', 'categorical') and pd.api.types.is_numeric_dtype(series.dtype):
+            # Could be fine (zip codes, numeric IDs) or a real mismatch
+            notes.append(f"Column '{raw_name}' is declared as {col.get('type')} but holds {series.dtype} values.")
+        elif declared is None:
+            notes.append(f"Column '{raw_name}' has an unrecognised declared type '{col.get('type')}'.")
+
+        if col.get('options') and declared != 'numeric':
+            _check_options(raw_name, series, col['options'], issues)
+
+    # Generated columns whose content only a semantic audit can judge
+    for spec in plan.columns:
+        if spec.kind == 'faker' and spec.faker_method in GENERIC_FAKER_METHODS:
+            notes.append(f"Column '{spec.name}' is filled with generic text ({spec.faker_method}).")
+        elif spec.kind == 'categorical' and spec.options in (placeholder_options(spec.name, 'ABC'), placeholder_options(spec.name, 'ABCD')):
+            notes.append(f"Column '{spec.name}' uses placeholder categories.")
+
+    if issues:
+        return SchemaCheck('fail', issues, notes)
+    if notes:
+        return SchemaCheck('escalate', notes=notes)
+    return SchemaCheck('pass')
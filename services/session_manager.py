@@ -12,9 +12,10 @@ def serialize_session(session_state):
     project_safe = None
     if project_snapshot:
         project_safe = project_snapshot.copy()
-        # Remove the 'data' key which holds the DataFrame object
-        if "data" in project_safe:
-            del project_safe["data"]
+        # Remove the DataFrame objects ('data', the clean copy) and the chaos overlay.
+        # Only the dirty dataset is saved, below.
+        for key in ("data", "clean_data", "chaos"):
+            project_safe.pop(key, None)
 
     # Sanitize notebook cells to remove non-serializable 'result' objects
     raw_cells = session_state.get("notebook_cells", [])
@@ -0,0 +1,502 @@
+import itertools
+import json
+import threading
+import weakref
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Name under which the project dataset `df` is also available in SQL
+DATA_ALIAS = 'data'
+
+# Rows per page of a SQL result, and how many fetched pages a result keeps
+PAGE_ROWS = 1000
+MAX_CACHED_PAGES = 8
+
+# Snapshots of paged results live in their own in-memory catalog, so they stay out of
+# SHOW TABLES and tables()
+RESULT_CATALOG = '__sql_results'
+RESULT_TABLE_PREFIX = '__sql_result_'
+
+# Plan operators that keep the row order of their input; ORDER BY and TOP N set an order of their own
+ORDER_PRESERVING_OPERATORS = {'PROJECTION', 'FILTER', 'LIMIT', 'STREAMING_LIMIT'}
+ORDERING_OPERATORS = {'ORDER_BY', 'TOP_N'}
+
+
+def pageable_statement(query: str) -> bool:
+    """
+    True if the query is a single SELECT (including WITH, FROM-first and VALUES forms).
+    Statements are split by DuckDB's own parser, so comments and string literals are handled.
+    """
+    try:
+        statements = duckdb.extract_statements(query)
+    except duckdb.Error:
+        return False
+    return len(statements) == 1 and statements[0].type == duckdb.StatementType.SELECT
+
+
+def _stable_order(node: dict) -> bool:
+    """
+    True if a plan (EXPLAIN FORMAT JSON) returns its rows in the same order on every run: scans
+    keep insertion order, while hash group-bys, joins, unions and the like don't unless sorted.
+    """
+    name = node.get('name', '')
+    if name in ORDERING_OPERATORS:
+        return True
+    children = node.get('children', [])
+    if not children:
+        return True
+    return name in ORDER_PRESERVING_OPERATORS and all(_stable_order(child) for child in children)
+
+
+def _subquery(query: str) -> str:
+    """The statement without its trailing semicolon, so it can be wrapped in SELECT ... FROM (...)."""
+    return query.strip().rstrip(';').rstrip()
+
+
+def _copy_on_write() -> bool:
+    """Copy-on-write is always on from pandas 3; before that it is an opt-in option."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.options.mode.copy_on_write is True
+    except (AttributeError, KeyError):
+        return False
+
+
+def _column_tokens(frame: pd.DataFrame) -> tuple:
+    """
+    One token per column identifying the buffer that holds its values. Registered frames are
+    pinned by a shallow copy, so pandas' copy-on-write moves any later write into a new buffer:
+    a changed token means changed data.
+    Tokens hold a reference to their buffer, so an address can't be reused while it is compared against.
+    None means the layout is unknown and the column always counts as changed; that is also the
+    case for every column without copy-on-write, or if the pandas internals read here change.
+    """
+    if not _copy_on_write():
+        return (None,) * len(frame.columns)
+    return tuple(_column_token(series) for _, series in frame.items())
+
+
+def _column_token(series: pd.Series):
+    try:
+        values = series.array
+        if isinstance(values, pd.Categorical):
+            return values.codes
+        if isinstance(series.dtype, np.dtype):
+            return series.to_numpy(copy=False)
+        # Arrow-backed columns (including the default string dtype) and masked arrays
+        arrow = getattr(values, '_pa_array', None)
+        data = getattr(values, '_data', None)
+        mask = getattr(values, '_mask', None)
+        if isinstance(arrow, (pa.ChunkedArray, pa.Array)):
+            return arrow
+        if isinstance(data, np.ndarray) and isinstance(mask, np.ndarray):
+            return (data, mask)
+    except Exception:
+        pass
+    return None
+
+
+def _same_token(a, b) -> bool:
+    if a is None or b is None:
+        return False
+    if isinstance(a, tuple):
+        return isinstance(b, tuple) and len(a) == len(b) and all(_same_token(x, y) for x, y in zip(a, b))
+    if isinstance(a, np.ndarray):
+        return (isinstance(b, np.ndarray) and a.shape == b.shape
+                and a.__array_interface__['data'][0] == b.__array_interface__['data'][0])
+    return a is b
+
+
+class SQLResult:
+    """
+    Result of a SQL cell, kept as Arrow. Small results hold their whole table. A larger SELECT
+    result is read a page at a time (see SQLSession.execute) and only the first page plus a few
+    recently viewed ones are kept; the row count is only computed on request, and the full table
+    is only fetched when Python code uses the result (via to_pandas) or a later SQL cell reads a
+    streamed result. The session's copy (stream or snapshot) is released then, so there is one
+    full copy per result, never two.
+    The pandas frame is not kept: the notebook scope holds it once Python code has used it.
+    """
+    __slots__ = ('session', 'table_name', 'page_rows', 'schema', '_table', '_pages', '_num_rows', '_release', '__weakref__')
+
+    def __init__(self, table: pa.Table, session=None, table_name: str = None, page_rows: int = PAGE_ROWS,
+                 read_ahead: pa.Table = None):
+        """
+        `table` is the whole result, or its first page when `session` holds the rest under
+        `table_name`; `read_ahead` is the second page if it was already read.
+        """
+        self.session = session
+        self.table_name = table_name
+        self.page_rows = page_rows
+        self.schema = table.schema
+        self._release = None
+        if session is None:
+            self._table, self._pages, self._num_rows = table, {}, table.num_rows
+        else:
+            self._table, self._pages, self._num_rows = None, {0: table}, None
+            if read_ahead is not None:
+                self._pages[1] = read_ahead
+            # The session's copy lives as long as this result (or until it is fetched in full)
+            self._release = weakref.finalize(self, session.discard, table_name)
+
+    @property
+    def paged(self) -> bool:
+        return self._table is None
+
+    @property
+    def table(self) -> pa.Table:
+        if self._table is None:
+            self._table = self.session.fetch_all(self.table_name)
+            self._num_rows = self._table.num_rows
+            self._pages.clear()
+            # Pages now come from the Arrow table; the session's copy can go
+            self._release()
+        return self._table
+
+    @property
+    def known_rows(self):
+        """Row count if already known (None until counted for paged results)."""
+        return self._num_rows
+
+    def num_rows(self) -> int:
+        if self._num_rows is None:
+            self._num_rows = self.session.count(self.table_name)
+        return self._num_rows
+
+    def __len__(self) -> int:
+        return self.num_rows()
+
+    def page(self, index: int) -> pa.Table:
+        if self._table is not None:
+            return self._table.slice(index * self.page_rows, self.page_rows)
+        page = self._pages.get(index)
+        if page is None:
+            page = self.session.fetch_page(self.table_name, index * self.page_rows, self.page_rows)
+            # Keep the first page plus a few recently viewed ones
+            while len(self._pages) >= MAX_CACHED_PAGES:
+                self._pages.pop(next(i for i in self._pages if i != 0))
+            self._pages[index] = page
+        return page
+
+    @property
+    def columns(self) -> list:
+        return self.schema.names
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        if n <= self.page_rows:
+            return self.page(0).slice(0, n).to_pandas()
+        return self.table.slice(0, n).to_pandas()
+
+    def to_pandas(self) -> pd.DataFrame:
+        return self.table.to_pandas()
+
+    def __repr__(self) -> str:
+        rows = f"{self._num_rows}" if self._num_rows is not None else f"{self.page_rows}+"
+        return f"SQLResult({rows} rows x {len(self.schema)} columns)"
+
+
+def _to_arrow(frame: pd.DataFrame):
+    """
+    Arrow copy of a frame for registration; numeric and Arrow-backed string columns are shared,
+    not copied. DuckDB scans Arrow natively, while pandas string/object columns are converted on
+    every query. Mixed-type columns (e.g. numbers with injected rogue strings) can't be Arrow,
+    so those frames stay pandas.
+    """
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError):
+        return frame
+
+
+class _Registration:
+    __slots__ = ('obj', 'relation', 'pin', 'columns', 'tokens', 'paged')
+
+    def __init__(self, obj, relation, frame: pd.DataFrame = None):
+        self.obj = obj
+        self.relation = relation
+        self.paged = isinstance(obj, SQLResult) and obj.paged
+        # The Arrow copy shares buffers with the frame; the pin makes writes copy instead of
+        # changing those buffers underneath DuckDB (bit-packed columns like bool would go stale)
+        self.pin = frame.copy(deep=False) if frame is not None else None
+        self.columns = tuple(map(str, frame.columns)) if frame is not None else ()
+        self.tokens = _column_tokens(frame) if frame is not None else ()
+
+    def matches(self, obj) -> bool:
+        if obj is not self.obj:
+            return False
+        if isinstance(obj, SQLResult):
+            # Arrow tables are immutable, but a paged result's snapshot is dropped once it is
+            # fetched in full, so the view then has to point at the fetched table
+            return obj.paged == self.paged
+        frame = obj.to_frame() if isinstance(obj, pd.Series) else obj
+        if tuple(map(str, frame.columns)) != self.columns:
+            return False
+        tokens = _column_tokens(frame)
+        return len(tokens) == len(self.tokens) and all(_same_token(a, b) for a, b in zip(tokens, self.tokens))
+
+
+class _Stream:
+    """
+    A SELECT with a stable row order, read forward through a record-batch reader on a connection
+    of its own, so queries on the session's connection can't invalidate it. Only the rows of the
+    page being read are in memory. A page out of sequence (or after a count) re-runs the query
+    from that offset, which returns the same rows because the order is stable and the stream's
+    connection keeps the frames registered when the query first ran.
+    """
+    __slots__ = ('cursor', 'query', 'reader', 'position', 'pending')
+
+    def __init__(self, cursor, query: str):
+        self.cursor = cursor
+        self.query = query
+        self.reader = None
+        self.position = 0
+        self.pending = None  # rows read past the end of the last page
+
+    def read(self, offset: int, limit: int) -> pa.Table:
+        if self.reader is None or offset != self.position:
+            query = self.query if offset == 0 else f'SELECT * FROM ({_subquery(self.query)}\n) OFFSET {int(offset)}'
+            self.reader = self.cursor.execute(query).fetch_record_batch(limit)
+            self.position, self.pending = offset, None
+        parts = [self.pending] if self.pending is not None else []
+        rows = sum(part.num_rows for part in parts)
+        while rows < limit:
+            try:
+                batch = self.reader.read_next_batch()
+            except StopIteration:
+                break
+            parts.append(pa.Table.from_batches([batch]))
+            rows += batch.num_rows
+        page = pa.concat_tables(parts) if parts else self.reader.schema.empty_table()
+        self.pending = page.slice(limit) if page.num_rows > limit else None
+        page = page.slice(0, limit)
+        self.position += page.num_rows
+        return page
+
+    def count(self) -> int:
+        # Running another query on this connection ends the reader
+        self.reader = None
+        return self.cursor.execute(f'SELECT count(*) FROM ({_subquery(self.query)}\n)').fetchone()[0]
+
+    def fetch_all(self) -> pa.Table:
+        self.reader = None
+        return self.cursor.execute(self.query).fetch_arrow_table()
+
+    def close(self):
+        self.reader = None
+        try:
+            self.cursor.close()
+        except Exception:
+            pass
+
+
+class SQLSession:
+    """
+    One long-lived DuckDB connection per user session.
+
+    DataFrames and Series in the notebook scope are registered as views and kept in sync by
+    object identity plus a per-column buffer check, so a SQL cell only (re)registers frames that
+    are new or were changed since the last query, and temp tables or views created by earlier
+    SQL cells stay available. Frames are registered through an Arrow copy made once per version,
+    and results come back as SQLResult (Arrow) instead of pandas.
+    """
+
+    def __init__(self, page_rows: int = PAGE_ROWS):
+        self.con = duckdb.connect()
+        self.page_rows = page_rows
+        self.con.execute(f"ATTACH ':memory:' AS \"{RESULT_CATALOG}\"")
+        self._registered = {}  # view name -> _Registration
+        # Reentrant: registering a streamed result fetches it while execute holds the lock
+        self._lock = threading.RLock()
+        self._closed = False
+        self._result_ids = itertools.count()
+        self._streams = {}  # result name -> _Stream; other paged results are snapshot tables
+        # Results that were garbage collected or fetched, released on the next query
+        self._discarded = []
+
+    def _frames(self, scope: dict) -> dict:
+        frames = {name: val for name, val in scope.items() if isinstance(val, (pd.DataFrame, pd.Series, SQLResult))}
+        # `data` is an alias of the project dataset unless the user defined their own
+        if DATA_ALIAS not in frames and isinstance(scope.get('df'), pd.DataFrame):
+            frames[DATA_ALIAS] = scope['df']
+        return frames
+
+    def _snapshot(self, name: str) -> str:
+        return f'"{RESULT_CATALOG}"."{name}"'
+
+    def _relation(self, result: SQLResult, con=None):
+        con = con or self.con
+        if result.session is self and result.paged and result.table_name not in self._streams:
+            # Query the snapshot in place instead of fetching it into Python
+            return con.table(f'{RESULT_CATALOG}.{result.table_name}')
+        # A streamed result can't be read by another query without running it again, so it is fetched
+        return result.table
+
+    def sync(self, scope: dict) -> list:
+        """Brings the registered views in line with `scope`; returns the names (re)registered."""
+        frames = self._frames(scope)
+        changed = []
+        converted = {}  # id(obj) -> (registration, relation), so `data` reuses df's Arrow copy
+        for name in [n for n in self._registered if n not in frames]:
+            try:
+                self.con.unregister(name)
+            except Exception:
+                pass
+            del self._registered[name]
+
+        for name, obj in frames.items():
+            registration = self._registered.get(name)
+            if registration is not None and registration.matches(obj):
+                continue
+            try:
+                if id(obj) in converted:
+                    registration, relation = converted[id(obj)]
+                elif isinstance(obj, SQLResult):
+                    relation = self._relation(obj)
+                    registration = _Registration(obj, relation)
+                else:
+                    # DuckDB requires a DataFrame for registration
+                    frame = obj.to_frame() if isinstance(obj, pd.Series) else obj
+                    relation = _to_arrow(frame)
+                    registration = _Registration(obj, relation, frame)
+                self.con.register(name, relation)
+            except Exception:
+                self._registered.pop(name, None)
+                continue # Ignore registration errors
+            self._registered[name] = registration
+            converted[id(obj)] = (registration, relation)
+            changed.append(name)
+        return changed
+
+    def discard(self, table_name: str):
+        """Marks a result's stream or snapshot for release. Called by the GC, so it only queues the name."""
+        self._discarded.append(table_name)
+
+    def _drop_discarded(self):
+        while self._discarded:
+            name = self._discarded.pop()
+            stream = self._streams.pop(name, None)
+            if stream is not None:
+                stream.close()
+                continue
+            try:
+                self.con.execute(f'DROP TABLE IF EXISTS {self._snapshot(name)}')
+            except duckdb.Error:
+                pass
+
+    def _stable_order(self, query: str) -> bool:
+        try:
+            plan = self.con.execute(f'EXPLAIN (FORMAT JSON) {query}').fetchone()[1]
+            return all(_stable_order(node) for node in json.loads(plan))
+        except (duckdb.Error, ValueError, TypeError, IndexError):
+            return False
+
+    def _open_stream(self, query: str) -> _Stream:
+        cursor = self.con.cursor()
+        stream = _Stream(cursor, query)
+        try:
+            # Registrations are per connection; the stream's connection gets the current ones
+            for name, registration in self._registered.items():
+                obj = registration.obj
+                relation = self._relation(obj, cursor) if isinstance(obj, SQLResult) else registration.relation
+                cursor.register(name, relation)
+        except Exception:
+            stream.close()
+            raise
+        return stream
+
+    def execute(self, query: str, scope: dict) -> SQLResult:
+        """
+        Runs a SQL cell. Only the first page of a single SELECT is fetched; if that is the whole
+        result, it is returned as a plain table. Otherwise:
+        - a SELECT whose row order is stable (per its plan) is streamed: its reader stays open
+          on a connection of its own and further pages are read forward from it;
+        - a SELECT whose order can change between runs (an unordered GROUP BY, JOIN, DISTINCT,
+          UNION...) runs once into a snapshot table, so every page comes from the same run.
+        Anything else (DDL, DML, several statements) runs as is and is fetched in full.
+        """
+        with self._lock:
+            self._check_open()
+            self.sync(scope)
+            self._drop_discarded()
+            if not pageable_statement(query):
+                return SQLResult(self.con.execute(query).fetch_arrow_table())
+
+            name = f"{RESULT_TABLE_PREFIX}{next(self._result_ids)}"
+            if self._stable_order(query):
+                try:
+                    stream = self._open_stream(query)
+                except Exception:
+                    stream = None
+                if stream is not None:
+                    try:
+                        first = stream.read(0, self.page_rows)
+                        second = stream.read(self.page_rows, self.page_rows) if first.num_rows == self.page_rows else None
+                    except duckdb.Error:
+                        # e.g. the query reads a temp table, which the stream's connection can't see
+                        stream.close()
+                    else:
+                        if second is None or second.num_rows == 0:
+                            stream.close()
+                            return SQLResult(first)
+                        self._streams[name] = stream
+                        return SQLResult(first, session=self, table_name=name, page_rows=self.page_rows,
+                                         read_ahead=second)
+
+            try:
+                self.con.execute(f'CREATE TABLE {self._snapshot(name)} AS {query}')
+            except duckdb.Error:
+                # Not valid as CREATE TABLE AS; run it as is (or surface its own error)
+                return SQLResult(self.con.execute(query).fetch_arrow_table())
+            first = self.con.execute(f'SELECT * FROM {self._snapshot(name)} LIMIT {self.page_rows + 1}').fetch_arrow_table()
+            if first.num_rows <= self.page_rows:
+                self.con.execute(f'DROP TABLE {self._snapshot(name)}')
+                return SQLResult(first)
+            return SQLResult(first.slice(0, self.page_rows), session=self, table_name=name, page_rows=self.page_rows)
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("This SQL session was closed (a new project was loaded); re-run the SQL cell.")
+
+    def fetch_page(self, table_name: str, offset: int, limit: int) -> pa.Table:
+        with self._lock:
+            self._check_open()
+            if table_name in self._streams:
+                return self._streams[table_name].read(offset, limit)
+            return self.con.execute(f'SELECT * FROM {self._snapshot(table_name)} LIMIT {int(limit)} OFFSET {int(offset)}').fetch_arrow_table()
+
+    def count(self, table_name: str) -> int:
+        with self._lock:
+            self._check_open()
+            if table_name in self._streams:
+                return self._streams[table_name].count()
+            return self.con.execute(f'SELECT count(*) FROM {self._snapshot(table_name)}').fetchone()[0]
+
+    def fetch_all(self, table_name: str) -> pa.Table:
+        with self._lock:
+            self._check_open()
+            if table_name in self._streams:
+                return self._streams[table_name].fetch_all()
+            return self.con.execute(f'SELECT * FROM {self._snapshot(table_name)}').fetch_arrow_table()
+
+    def tables(self) -> list:
+        """Names queryable in SQL: registered frames plus tables and views created by the user."""
+        with self._lock:
+            rows = self.con.execute("SELECT table_name FROM information_schema.tables WHERE table_catalog <> ?",
+                                    [RESULT_CATALOG]).fetchall()
+        return sorted(set(self._registered) | {r[0] for r in rows})
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._registered.clear()
+            self._discarded.clear()
+            for stream in self._streams.values():
+                stream.close()
+            self._streams.clear()
+            try:
+                self.con.close()
+            except Exception:
+                pass
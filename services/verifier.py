@@ -1,7 +1,13 @@
 from .llm import LLMService
+from .recipe_plan import compile_recipe
+from .schema_checks import check_dataset
 import pandas as pd
 import json
 
+def _passed(verification: dict) -> bool:
+    """Only passing verdicts are cached; a failing one must be re-judged after the recipe is refined."""
+    return verification.get('valid') is True
+
 class VerifierService:
     def __init__(self):
         self.llm_service = LLMService()
@@ -11,9 +17,23 @@ class VerifierService:
         Verifies if the generated dataset fits the scenario, tasks, and schema description.
         Returns a JSON report.
         """
-        if df is None or df.empty:
-            return {"valid": False, "issues": ["Dataset is empty."], "score": 0}
+        # Local pre-pass: clear mechanical failures never reach the LLM. Clean datasets still do,
+        # since data generated from the schema always matches it; task coverage needs the audit.
+        check = check_dataset(project_definition, df)
+        if check.status == 'fail':
+            return check.report()
+
+        return self.llm_service.generate_json(self._build_prompt(project_definition, df, check.notes), api_key, temperature=0.1, stage="verify", cache_if=_passed)
+
+    async def averify_dataset_schema(self, project_definition: dict, df: pd.DataFrame, api_key: str) -> dict:
+        """Async version of verify_dataset_schema."""
+        check = check_dataset(project_definition, df)
+        if check.status == 'fail':
+            return check.report()
 
+        return await self.llm_service.agenerate_json(self._build_prompt(project_definition, df, check.notes), api_key, temperature=0.1, stage="verify", cache_if=_passed)
+
+    def _build_prompt(self, project_definition: dict, df: pd.DataFrame, notes: list = None) -> str:
         # Prepare context
         title = project_definition.get('title', 'N/A')
         description = project_definition.get('description', 'N/A')
@@ -26,11 +46,18 @@ class VerifierService:
         else:
             display_schema = project_definition.get('display_schema', [])
 
+        # Column names as they appear in the generated data (normalized to snake_case)
+        plan = compile_recipe(project_definition)
+        generated_columns = "\n".join(f"- {spec.name} ({spec.kind})" for spec in plan.columns)
+        known_issues = "\n".join(f"- {issue}" for issue in plan.issues) or "None"
+        # Mechanical checks already passed; these are the points they could not decide
+        open_questions = "\n".join(f"- {note}" for note in (notes or [])) or "None"
+
         # Data Sample
         sample_head = df.head(5).to_string(index=False)
         dtypes = df.dtypes.to_string()
 
-        prompt = f"""
+        return f"""
         Act as a Data Quality Auditor.
         You are verifying a synthetic dataset generated for a specific Data Analysis Project.
 
@@ -44,6 +71,15 @@ class VerifierService:
         **Expected Schema (What the user was told):**
         {json.dumps(display_schema, indent=2)}
 
+        **Generated Columns (names are normalized to snake_case, this is NOT a mismatch):**
+        {generated_columns}
+
+        **Known Generation Issues:**
+        {known_issues}
+
+        **Automated Checks (all declared columns exist and have the declared types; please judge these points):**
+        {open_questions}
+
         **Actual Data Sample (First 5 rows):**
         {sample_head}
 
@@ -74,5 +110,3 @@ class VerifierService:
             ]
         }}
         """
-
-        return self.llm_service.generate_json(prompt, api_key, temperature=0.1)
@@ -2,13 +2,15 @@
 import os
 import sys
 from services.generator import project_generator
+from services.llm_replay import llm_backend
 
 # User provided API key
 API_KEY = os.getenv("GEMINI_API_KEY")
 
 def verify_sector_adherence():
-    if not API_KEY:
-        print("Error: GEMINI_API_KEY environment variable not set.")
+    # LLM_BACKEND=replay runs offline against recorded responses (fixtures/llm)
+    if not API_KEY and not (llm_backend is not None and llm_backend.offline):
+        print("Error: GEMINI_API_KEY environment variable not set (or set LLM_BACKEND=replay to run offline).")
         sys.exit(1)
 
     print("Testing Sector Adherence for 'Fintech'...")